@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+import argparse, json, sqlite3, time
+from datetime import datetime, timezone
+
+HISTORY_FILE = 'battles.db'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS battles (
+    id            TEXT PRIMARY KEY,
+    account       TEXT,
+    agent_id      TEXT,
+    agent_name    TEXT,
+    opponent      TEXT,
+    won           INTEGER,
+    old_rating    REAL,
+    new_rating    REAL,
+    rating_change REAL,
+    status        TEXT,
+    finished_at   REAL,
+    raw           TEXT
+);
+CREATE TABLE IF NOT EXISTS rounds (
+    battle_id TEXT,
+    idx       INTEGER,
+    winner    TEXT,
+    result    TEXT,
+    PRIMARY KEY (battle_id, idx)
+);
+CREATE INDEX IF NOT EXISTS ix_battles_agent    ON battles (agent_id, finished_at);
+CREATE INDEX IF NOT EXISTS ix_battles_name     ON battles (agent_name, finished_at);
+CREATE INDEX IF NOT EXISTS ix_battles_opponent ON battles (opponent);
+CREATE INDEX IF NOT EXISTS ix_battles_time     ON battles (finished_at);
+'''
+
+def connect(path=HISTORY_FILE):
+    db = sqlite3.connect(path)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.executescript(SCHEMA)
+    return db
+
+def _name(x):
+    return x.get('name', '') if isinstance(x, dict) else str(x or '')
+
+def _num(x):
+    try: return float(x)
+    except (TypeError, ValueError): return None
+
+FINISHED_KEYS = ('finishedAt', 'completedAt', 'endedAt', 'finished_at', 'completed_at', 'ended_at')
+
+def finished_time(battle_data):
+    # epoch detik/milidetik atau ISO 8601 dari payload; None kalau tidak ada
+    for k in FINISHED_KEYS:
+        v = battle_data.get(k)
+        if v in (None, ''):
+            continue
+        if isinstance(v, (int, float)) or str(v).replace('.', '', 1).isdigit():
+            v = float(v)
+            return v / 1000 if v > 1e12 else v
+        try:
+            dt = datetime.fromisoformat(str(v).replace('Z', '+00:00'))
+        except ValueError:
+            continue
+        return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+    return None
+
+# ===== WRITE =====
+def record_battle(db, battle_data, account, agent_id, agent_name, finished_at=None):
+    battle_id = battle_data.get('id')
+    if not battle_id:
+        return False
+    won = _name(battle_data.get('winner')) == agent_name
+    rounds = []
+    for idx, rd in enumerate(battle_data.get('rounds') or []):
+        rn = _name(rd.get('winner'))
+        result = 'W' if rn == agent_name else ('D' if rn == '' else 'L')
+        rounds.append((battle_id, idx, rn, result))
+    with db:
+        db.execute(
+            'INSERT OR REPLACE INTO battles VALUES (?,?,?,?,?,?,?,?,?,?,?,?)',
+            (battle_id, account, agent_id, agent_name,
+             _name(battle_data.get('opponent')) or None, int(won),
+             _num(battle_data.get('oldRating')), _num(battle_data.get('newRating')),
+             _num(battle_data.get('ratingChange')), str(battle_data.get('status', '')),
+             finished_at or finished_time(battle_data) or time.time(), json.dumps(battle_data)))
+        db.execute('DELETE FROM rounds WHERE battle_id = ?', (battle_id,))
+        db.executemany('INSERT INTO rounds VALUES (?,?,?,?)', rounds)
+    return True
+
+# ===== QUERY =====
+def _agent_filter(agent, since, alias='', *extra):
+    where, args = list(extra), []
+    if agent:
+        where.append(f'({alias}agent_id = ? OR {alias}agent_name = ?)')
+        args += [agent, agent]
+    if since:
+        where.append(f'{alias}finished_at >= ?')
+        args.append(since)
+    return (' WHERE ' + ' AND '.join(where)) if where else '', args
+
+def rating_trend(db, agent, since=None):
+    where, args = _agent_filter(agent, since, '', 'new_rating IS NOT NULL')
+    return db.execute(
+        f'SELECT finished_at, new_rating, rating_change, won FROM battles{where} ORDER BY finished_at',
+        args).fetchall()
+
+def win_rate_by_opponent(db, agent=None, since=None, min_battles=1):
+    where, args = _agent_filter(agent, since)
+    return db.execute(
+        f'SELECT opponent, COUNT(*) AS n, SUM(won) AS w, ROUND(100.0 * SUM(won) / COUNT(*), 1) '
+        f'FROM battles{where} GROUP BY opponent HAVING n >= ? ORDER BY n DESC, w DESC',
+        args + [min_battles]).fetchall()
+
+def round_stats(db, agent=None, since=None):
+    where, args = _agent_filter(agent, since, 'b.')
+    return db.execute(
+        'SELECT r.idx + 1, '
+        "SUM(r.result = 'W'), SUM(r.result = 'L'), SUM(r.result = 'D'), "
+        "ROUND(100.0 * SUM(r.result = 'W') / COUNT(*), 1) "
+        f'FROM rounds r JOIN battles b ON b.id = r.battle_id{where} '
+        'GROUP BY r.idx ORDER BY r.idx',
+        args).fetchall()
+
+def summary(db, agent=None, since=None):
+    where, args = _agent_filter(agent, since)
+    return db.execute(
+        'SELECT agent_name, COUNT(*), SUM(won), ROUND(100.0 * SUM(won) / COUNT(*), 1), '
+        'SUM(rating_change), MAX(finished_at) '
+        f'FROM battles{where} GROUP BY agent_id ORDER BY COUNT(*) DESC',
+        args).fetchall()
+
+# ===== CLI =====
+def _ts(epoch):
+    return datetime.fromtimestamp(epoch).strftime('%Y-%m-%d %H:%M') if epoch else '-'
+
+def main(argv=None):
+    from rich.console import Console
+    from rich.table import Table
+    from rich import box
+
+    p = argparse.ArgumentParser(description='Analitik riwayat battle MoltArena (lokal, tanpa API).')
+    p.add_argument('--db', default=HISTORY_FILE)
+    p.add_argument('--days', type=float, help='hanya battle N hari terakhir')
+    sub = p.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('summary').add_argument('--agent')
+    sub.add_parser('trend').add_argument('agent')
+    opp = sub.add_parser('opponents')
+    opp.add_argument('--agent')
+    opp.add_argument('--min', type=int, default=1)
+    sub.add_parser('rounds').add_argument('--agent')
+    args = p.parse_args(argv)
+
+    db = connect(args.db)
+    since = time.time() - args.days * 86400 if args.days else None
+    console = Console()
+    table = Table(box=box.ROUNDED, border_style='cyan', padding=(0, 2))
+    if args.cmd == 'summary':
+        table.title = 'Ringkasan Agent'
+        for col in ('Agent', 'Battle', 'W', 'WR%', 'Rating +/-', 'Terakhir'):
+            table.add_column(col, justify='left' if col == 'Agent' else 'right')
+        for name, n, w, wr, rc, last in summary(db, args.agent, since):
+            table.add_row(name or '?', str(n), str(w), f'{wr}%', f'{rc or 0:+.1f}', _ts(last))
+    elif args.cmd == 'trend':
+        table.title = f'Rating Trend - {args.agent}'
+        for col in ('Waktu', 'Rating', '+/-', 'Hasil'):
+            table.add_column(col, justify='right')
+        for at, rating, rc, won in rating_trend(db, args.agent, since):
+            table.add_row(_ts(at), f'{rating:.1f}', f'{rc or 0:+.1f}',
+                          '[green]W[/green]' if won else '[red]L[/red]')
+    elif args.cmd == 'opponents':
+        table.title = 'Win Rate per Lawan'
+        for col in ('Lawan', 'Battle', 'W', 'WR%'):
+            table.add_column(col, justify='left' if col == 'Lawan' else 'right')
+        for opp_name, n, w, wr in win_rate_by_opponent(db, args.agent, since, args.min):
+            table.add_row(opp_name or '?', str(n), str(w), f'{wr}%')
+    elif args.cmd == 'rounds':
+        table.title = 'Statistik per Ronde'
+        for col in ('Ronde', 'W', 'L', 'D', 'WR%'):
+            table.add_column(col, justify='right')
+        for idx, w, l, d, wr in round_stats(db, args.agent, since):
+            table.add_row(str(idx), str(w), str(l), str(d), f'{wr}%')
+    console.print(table)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# Benchmark end-to-end: main() asli melawan fake_server, waktu diskalakan ke detik.
+# Contoh: python bench.py --accounts 3 --agents 2 --cycles 10 --latency 0.02
+import argparse, json, os, tempfile, time
+from rich.console import Console
+from rich.table import Table
+from rich import box
+
+import moltarena_bot as bot
+from fake_server import FakeArena
+
+def configure_bot(args, url):
+    bot.BASE_URL = url
+    bot.DEBUG = args.debug
+    bot.BATTLE_INTERVAL = args.interval if args.interval is not None else args.rate_limit + 0.5
+    bot.DEFAULT_RETRY_AFTER = args.rate_limit
+    bot.RATE_LIMIT_MARGIN = 0.1
+    bot.FAILED_BATTLE_DELAY = 1
+    bot.RETRY_BACKOFF = 0.05
+    bot.BREAKER_COOLDOWN = args.rate_limit
+    bot.POLL_INTERVAL = args.poll
+    bot.POLL_MIN = args.poll / 3
+    bot.POLL_MAX = args.poll * 4
+    bot.MAX_WAIT_BATTLE = args.battle_max * 5
+    bot.NOTIFY_INTERVAL = args.poll
+    bot.FALLBACK_POLL = args.poll * 8
+    bot.ACCOUNT_DELAY = (0, 0)
+    bot.VOTE_DELAY = (0, 0.01)
+    if not args.show:
+        bot.console = Console(file=open(os.devnull, 'w'), force_terminal=True, width=120)
+
+def run(args):
+    arena = FakeArena(latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit,
+                      battle_duration=(args.battle_min, args.battle_max),
+                      bulk_path='/agents/batch' if args.bulk else None,
+                      error_rate=args.error_rate, seed=args.seed)
+    accounts = [arena.add_account(f'acc{i + 1}', args.agents) for i in range(args.accounts)]
+    arena.seed_voting_battles(args.votes)
+    srv, url = arena.serve()
+
+    workdir = tempfile.mkdtemp(prefix='moltarena-bench-')
+    os.chdir(workdir)
+    with open('accounts.json', 'w') as f:
+        json.dump(accounts, f)
+    configure_bot(args, url)
+
+    rows = []
+    last = {'t': time.perf_counter(), **bot.perf}
+    def on_cycle(cycle):
+        t = time.perf_counter()
+        rows.append({
+            'cycle': cycle,
+            'requests': bot.perf['requests'] - last['requests'],
+            'wall': t - last['t'],
+            'sleep': bot.perf['sleep'] - last['sleep'],
+            'render': bot.perf['render'] - last['render'],
+        })
+        last.update(t=t, **bot.perf)
+    bot.cycle_hooks.append(on_cycle)
+
+    t0 = time.perf_counter()
+    bot.main(max_cycles=args.cycles)
+    total = time.perf_counter() - t0
+    srv.shutdown()
+    return {
+        'config': vars(args),
+        'workdir': workdir,
+        'total_wall': total,
+        'totals': dict(bot.perf),
+        'cycles': rows,
+        'server_hits': dict(arena.hits.most_common()),
+        'status_codes': {str(k): v for k, v in sorted(arena.status_codes.items())},
+    }
+
+def report(res):
+    console = Console()
+    table = Table(title='Benchmark per Siklus', box=box.ROUNDED, border_style='cyan', padding=(0, 2))
+    for col in ('Siklus', 'Request', 'Wall (s)', 'Sleep (s)', 'Render (ms)'):
+        table.add_column(col, justify='right')
+    for r in res['cycles']:
+        table.add_row(f'#{r["cycle"]}', str(r['requests']), f'{r["wall"]:.2f}',
+                      f'{r["sleep"]:.2f}', f'{r["render"] * 1000:.1f}')
+    n = max(len(res['cycles']), 1)
+    t = res['totals']
+    table.add_row('[bold]avg[/bold]', f'{t["requests"] / n:.1f}', f'{res["total_wall"] / n:.2f}',
+                  f'{t["sleep"] / n:.2f}', f'{t["render"] * 1000 / n:.1f}')
+    console.print(table)
+    hits = Table(title='Server Hits', box=box.SIMPLE_HEAD, padding=(0, 2))
+    hits.add_column('Endpoint')
+    hits.add_column('Hits', justify='right')
+    for ep, c in res['server_hits'].items():
+        hits.add_row(ep, str(c))
+    console.print(hits)
+    console.print(f'Status code: {res["status_codes"]}  |  total wall {res["total_wall"]:.2f}s  |  {res["workdir"]}')
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Benchmark bot MoltArena melawan fake_server.')
+    p.add_argument('--accounts', type=int, default=2)
+    p.add_argument('--agents', type=int, default=2)
+    p.add_argument('--cycles', type=int, default=6)
+    p.add_argument('--votes', type=int, default=5, help='battle voting yang di-seed')
+    p.add_argument('--latency', type=float, default=0.01, help='latency server per request (s)')
+    p.add_argument('--jitter', type=float, default=0.0)
+    p.add_argument('--error-rate', type=float, default=0.0, help='fraksi request yang dibalas 503')
+    p.add_argument('--rate-limit', type=float, default=3.0, help='jeda server antar battle per akun (s)')
+    p.add_argument('--interval', type=float, help='BATTLE_INTERVAL bot (default rate-limit + 0.5)')
+    p.add_argument('--battle-min', type=float, default=1.0)
+    p.add_argument('--battle-max', type=float, default=2.0)
+    p.add_argument('--poll', type=float, default=0.5, help='POLL_INTERVAL bot (s)')
+    p.add_argument('--bulk', action='store_true', help='server punya GET /agents/batch?ids=')
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('--debug', action='store_true')
+    p.add_argument('--show', action='store_true', help='tampilkan output bot')
+    p.add_argument('--json', metavar='FILE', help='simpan hasil sebagai JSON')
+    args = p.parse_args(argv)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    res = run(args)
+    report(res)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(res, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+# Server MoltArena palsu (stdlib saja) buat test/benchmark offline.
+# Jalankan: python fake_server.py --port 8787  lalu  MOLTARENA_BASE_URL=http://127.0.0.1:8787/api
+import argparse, hashlib, itertools, json, random, re, threading, time
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+class FakeArena:
+    def __init__(self, latency=0.0, jitter=0.0, battle_duration=(2.0, 4.0), rate_limit=3.0,
+                 stats_path='/me', notifications_path='/notifications/poll',
+                 active_path='/battles?status=voting', bulk_path=None, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.battle_duration = battle_duration
+        self.rate_limit = rate_limit
+        self.stats_path = stats_path
+        self.notifications_path = notifications_path
+        self.active_path = active_path
+        self.bulk_path = bulk_path
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.agents = {}
+        self.accounts = {}
+        self.battles = {}
+        self.votes = set()
+        self.ids = itertools.count(1)
+        self.hits = Counter()
+        self.status_codes = Counter()
+
+    # ===== SETUP =====
+    def add_account(self, name, n_agents=2, rating=1000.0):
+        api_key = f'key-{name}'
+        ids = []
+        for _ in range(n_agents):
+            aid = f'agent-{next(self.ids):04d}'
+            self.agents[aid] = {'id': aid, 'name': f'{name}-{aid[-4:]}', 'rating': rating,
+                                'wins': 0, 'losses': 0, 'owner': api_key, 'updated': time.time()}
+            ids.append(aid)
+        self.accounts[api_key] = {'name': name, 'battlePoints': 0, 'next_at': 0.0, 'notifications': []}
+        return {'name': name, 'apiKey': api_key, 'myAgentIds': ids}
+
+    def seed_voting_battles(self, n=5):
+        for _ in range(n):
+            bid = f'vote-{next(self.ids):04d}'
+            self.battles[bid] = {'id': bid, 'status': 'voting', 'started': time.time(), 'duration': 0,
+                                 'agent1': {'id': f'ext-{bid}-1', 'name': f'Ext{bid[-4:]}A'},
+                                 'agent2': {'id': f'ext-{bid}-2', 'name': f'Ext{bid[-4:]}B'},
+                                 'owner': None, 'updated': time.time()}
+
+    # ===== BATTLE PROGRESSION =====
+    def battle_view(self, b):
+        elapsed = time.time() - b['started']
+        if b['owner'] and b['status'] not in ('finished',):
+            if elapsed >= b['duration']:
+                self.resolve(b)
+            elif elapsed >= b['duration'] * 0.2:
+                self.set_status(b, 'running')
+        return {k: v for k, v in b.items() if k not in ('owner', 'started', 'duration', 'updated')}
+
+    def set_status(self, b, status):
+        if b['status'] != status:
+            b['status'] = status
+            b['updated'] = time.time()
+
+    def resolve(self, b):
+        ag = self.agents[b['agent1']['id']]
+        won = self.rng.random() < 0.5
+        rc = round(self.rng.uniform(5, 20), 1) * (1 if won else -1)
+        old_r = ag['rating']
+        ag['rating'] = round(old_r + rc, 1)
+        ag['wins' if won else 'losses'] += 1
+        ag['updated'] = time.time()
+        rounds = []
+        for _ in range(b['rounds_n']):
+            pick = self.rng.choice((ag['name'], b['opponent']['name'], ''))
+            rounds.append({'winner': {'name': pick} if pick else None})
+        done = datetime.fromtimestamp(b['started'] + b['duration'], timezone.utc).isoformat()
+        b.update(winner={'name': ag['name'] if won else b['opponent']['name']},
+                 oldRating=old_r, newRating=ag['rating'], ratingChange=rc, rounds=rounds, finishedAt=done)
+        self.set_status(b, 'finished')
+        acct = self.accounts[b['owner']]
+        acct['battlePoints'] += 3 if won else 1
+        acct['notifications'].append({'type': 'battle_complete', 'battleId': b['id'],
+                                      'message': f'{ag["name"]} {"menang" if won else "kalah"} vs {b["opponent"]["name"]}'})
+
+    # ===== ROUTES =====
+    def handle(self, method, path, api_key, body):
+        if api_key not in self.accounts:
+            return 401, {'error': 'unauthorized'}, None
+        if self.error_rate and self.rng.random() < self.error_rate:
+            return 503, {'error': 'unavailable'}, None
+        acct = self.accounts[api_key]
+        route = urlsplit(path)
+        p = route.path
+        if method == 'GET':
+            if self.bulk_path and p == self.bulk_path:
+                ids = parse_qs(route.query).get('ids', [''])[0].split(',')
+                items = [{k: v for k, v in self.agents[aid].items() if k not in ('owner', 'updated')}
+                         for aid in ids if aid in self.agents]
+                return 200, {'agents': items}, None
+            m = re.fullmatch(r'/agents/([^/]+)', p)
+            if m:
+                ag = self.agents.get(m.group(1))
+                if not ag:
+                    return 404, {'error': 'not found'}, None
+                return 200, {'agent': {k: v for k, v in ag.items() if k not in ('owner', 'updated')}}, ag['updated']
+            if path == self.stats_path:
+                return 200, {'data': {'name': acct['name'], 'battlePoints': acct['battlePoints']}}, None
+            if path == self.notifications_path:
+                # battle diselesaikan lazily; majukan dulu supaya event battle_complete muncul tepat waktu
+                for b in self.battles.values():
+                    if b['owner'] == api_key:
+                        self.battle_view(b)
+                events, acct['notifications'] = acct['notifications'], []
+                return 200, {'data': events}, None
+            if path == self.active_path:
+                items = [self.battle_view(b) for b in self.battles.values() if b['status'] == 'voting']
+                return 200, {'battles': items}, None
+            m = re.fullmatch(r'/battles/([^/]+)', p)
+            if m and m.group(1) in self.battles:
+                b = self.battles[m.group(1)]
+                view = self.battle_view(b)
+                return 200, {'data': view}, b['updated']
+            return 404, {'error': 'not found'}, None
+        if method == 'POST':
+            if p == '/deploy/battle':
+                t = time.time()
+                if t < acct['next_at']:
+                    at = datetime.fromtimestamp(acct['next_at'], timezone.utc).isoformat()
+                    return 429, {'error': 'rate limited', 'retryAfter': round(acct['next_at'] - t, 1),
+                                 'nextAvailableAt': at}, None
+                aid = (body or {}).get('agent1Id')
+                if aid not in self.agents or self.agents[aid]['owner'] != api_key:
+                    return 400, {'error': 'invalid agent'}, None
+                acct['next_at'] = t + self.rate_limit
+                bid = f'battle-{next(self.ids):05d}'
+                ag = self.agents[aid]
+                self.battles[bid] = {
+                    'id': bid, 'status': 'pending', 'started': t, 'updated': t,
+                    'duration': self.rng.uniform(*self.battle_duration), 'owner': api_key,
+                    'rounds_n': int((body or {}).get('rounds', 5)),
+                    'agent1': {'id': aid, 'name': ag['name']},
+                    'opponent': {'name': f'Rival{self.rng.randint(1, 20):02d}'},
+                }
+                return 201, {'battle': {'id': bid, 'status': 'pending'}}, None
+            m = re.fullmatch(r'/battles/([^/]+)/vote', p)
+            if m and m.group(1) in self.battles:
+                key = (api_key, m.group(1))
+                if key in self.votes:
+                    return 400, {'error': 'already voted'}, None
+                self.votes.add(key)
+                acct['battlePoints'] += 1
+                return 200, {'data': {'pointsEarned': 1}}, None
+        return 404, {'error': 'not found'}, None
+
+    def request(self, method, path, headers, body):
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        with self.lock:
+            self.hits[f'{method} {urlsplit(path).path}'] += 1
+            api_key = (headers.get('Authorization') or '').replace('Bearer ', '', 1)
+            code, obj, updated = self.handle(method, path, api_key, body)
+            self.status_codes[code] += 1
+        raw = json.dumps(obj).encode()
+        extra = {}
+        if code == 200 and updated is not None:
+            etag = '"%s"' % hashlib.md5(raw).hexdigest()[:16]
+            extra = {'ETag': etag, 'Last-Modified': formatdate(updated, usegmt=True)}
+            if headers.get('If-None-Match') == etag:
+                return 304, b'', extra
+        return code, raw, extra
+
+    def serve(self, host='127.0.0.1', port=0):
+        arena = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def dispatch(self, method):
+                n = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(n) if n else b''
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    body = None
+                path = self.path[4:] if self.path.startswith('/api') else self.path
+                code, data, extra = arena.request(method, path, self.headers, body)
+                self.send_response(code)
+                for k, v in extra.items():
+                    self.send_header(k, v)
+                if code != 304:
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                if code != 304:
+                    self.wfile.write(data)
+
+            def do_GET(self):
+                self.dispatch('GET')
+
+            def do_POST(self):
+                self.dispatch('POST')
+
+        srv = ThreadingHTTPServer((host, port), Handler)
+        srv.daemon_threads = True
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        return srv, f'http://{host}:{srv.server_address[1]}/api'
+
+def main():
+    p = argparse.ArgumentParser(description='Server MoltArena palsu untuk test offline.')
+    p.add_argument('--port', type=int, default=8787)
+    p.add_argument('--accounts', type=int, default=2)
+    p.add_argument('--agents', type=int, default=2)
+    p.add_argument('--latency', type=float, default=0.05)
+    p.add_argument('--jitter', type=float, default=0.0)
+    p.add_argument('--rate-limit', type=float, default=620)
+    p.add_argument('--battle-duration', type=float, nargs=2, default=(60, 180))
+    p.add_argument('--error-rate', type=float, default=0.0)
+    p.add_argument('--write-accounts', metavar='FILE', help='tulis accounts.json untuk server ini')
+    args = p.parse_args()
+    arena = FakeArena(latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit,
+                      battle_duration=tuple(args.battle_duration), error_rate=args.error_rate)
+    accs = [arena.add_account(f'acc{i + 1}', args.agents) for i in range(args.accounts)]
+    arena.seed_voting_battles()
+    if args.write_accounts:
+        with open(args.write_accounts, 'w') as f:
+            json.dump(accs, f, indent=2)
+    srv, url = arena.serve(port=args.port)
+    print(f'Fake MoltArena di {url}  (MOLTARENA_BASE_URL={url})')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -1,46 +1,341 @@
 # -*- coding: utf-8 -*-
-import requests, json, time, random, os, sys
-from datetime import datetime
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.text import Text
-from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
-from rich import box
-
-BASE_URL = 'https://moltarena.crosstoken.io/api'
+import argparse, functools, hashlib, itertools, requests, json, time, random, os, re, sys, tempfile, threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+import sqlite3
+import battle_history
+
+BASE_URL = os.environ.get('MOLTARENA_BASE_URL', 'https://moltarena.crosstoken.io/api')
 ACCOUNTS_FILE = 'accounts.json'
+ENDPOINTS_FILE = os.path.join(os.path.dirname(ACCOUNTS_FILE), 'endpoints.json')
+JOURNAL_FILE = ACCOUNTS_FILE + '.journal'
+HISTORY_FILE = os.path.join(os.path.dirname(ACCOUNTS_FILE), battle_history.HISTORY_FILE)
+METRICS_PROM_FILE = os.path.join(os.path.dirname(ACCOUNTS_FILE), 'metrics.prom')
+METRICS_JSON_FILE = os.path.join(os.path.dirname(ACCOUNTS_FILE), 'metrics.json')
+SNAPSHOT_FILE = os.path.join(os.path.dirname(ACCOUNTS_FILE), 'snapshot.json')
+SNAPSHOT_MAX_AGE = 7 * 86400
+REVALIDATE_RETRY = 300
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+JOURNAL_COMPACT_EVERY = 200
 BATTLE_INTERVAL = 620
+DEFAULT_RETRY_AFTER = 610
+RATE_LIMIT_MARGIN = 10
+FAILED_BATTLE_DELAY = 60
 ACCOUNT_DELAY = (3, 6)
 REQUEST_TIMEOUT = 30
 MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_BACKOFF_MAX = 8
+RETRY_BUDGET_RATIO = 0.1
+RETRY_BUDGET_MAX = 10
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 60
+NON_IDEMPOTENT = ('/deploy/battle',)
+AGENT_TTL = 3600
+STATS_TTL = 1800
+POOL_SIZE = 4
+AGENT_WORKERS = POOL_SIZE
+UNSUPPORTED_TTL = 86400
+CONDITIONAL_CACHE_SIZE = 512
 POLL_INTERVAL = 15
+POLL_MIN = 5
+POLL_MAX = 60
 MAX_WAIT_BATTLE = 900
+NOTIFY_INTERVAL = 10
+FALLBACK_POLL = 120
 ROUNDS = 5
 STRATEGY = 'similar_rating'
 DEBUG = True
 VOTE_DELAY = (1, 3)
 MAX_VOTE_PER_CYCLE = 50
+HEADLESS = os.environ.get('MOLTARENA_HEADLESS', '') not in ('', '0')
+LIVE = False
+RECORD_FILE = None
+REPLAY_FILE = None
+CLOCK_SPEED = 1.0
+PROFILE_DIR = None
+LIVE_LOG_LINES = 8
+
+# rich baru di-import saat output interaktif benar-benar dipakai (mode headless tidak pernah);
+# satu instance Console dipakai bersama, termasuk oleh rich.live.Live
+console = None
+
+def get_console():
+    global console
+    if console is None:
+        from rich.console import Console
+        console = Console()
+    return console
+
+# ===== HEADLESS – EVENT JSONL KE STDOUT =====
+MARKUP_RE = re.compile(r'\[/?(?:(?:bold|dim|italic|underline|red|green|yellow|cyan|magenta|white|blue)\s*)*\]')
+
+def strip_markup(text):
+    return MARKUP_RE.sub('', str(text))
+
+def emit(event, **fields):
+    sys.stdout.write(json.dumps({'ts': datetime.now().isoformat(timespec='seconds'), 'event': event, **fields},
+                                default=str, ensure_ascii=False) + '\n')
+    sys.stdout.flush()
+
+def rule(title):
+    if not HEADLESS and not LIVE:
+        get_console().rule(title)
+
+# counter kasar buat benchmark: jumlah request HTTP, detik network/tidur/decode JSON/render
+perf = {'requests': 0, 'network': 0.0, 'sleep': 0.0, 'json': 0.0, 'render': 0.0}
+cycle_hooks = []
+# waktu yang sama dipecah per fungsi @scoped terdalam yang sedang jalan: (fungsi, jenis) -> detik
+perf_scopes = {}
+_perf_lock = threading.Lock()
+_local = threading.local()
+
+def scope_stack():
+    stack = getattr(_local, 'scopes', None)
+    if stack is None:
+        stack = _local.scopes = []
+    return stack
+
+def count(kind, n=1):
+    with _perf_lock:
+        perf[kind] += n
+
+@contextmanager
+def timed(kind):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t
+        stack = scope_stack()
+        key = (stack[-1] if stack else 'main', kind)
+        with _perf_lock:
+            perf[kind] += dt
+            perf_scopes[key] = perf_scopes.get(key, 0.0) + dt
+
+def scoped(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = scope_stack()
+        stack.append(func.__name__)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stack.pop()
+    return wrapper
+
+# jam virtual: saat replay cassette waktu bisa dipercepat (CLOCK_SPEED > 1) atau dilompati (0).
+# worker paralel punya kursor waktu sendiri (mulai dari saat di-submit) dan jam bersama hanya
+# didorong sampai titik akhir tiap thread, jadi request paralel tumpang tindih seperti saat
+# direkam, bukan dijumlahkan
+_clock_offset = 0.0
+_clock_lock = threading.Lock()
+_clock_local = threading.local()
+
+def thread_now():
+    t = getattr(_clock_local, 't', None)
+    return now() if t is None else t
+
+@contextmanager
+def clock_from(t):
+    prev = getattr(_clock_local, 't', None)
+    _clock_local.t = t
+    try:
+        yield
+    finally:
+        _clock_local.t = prev
+
+def pass_time(seconds):
+    global _clock_offset
+    end = thread_now() + seconds
+    real = seconds / CLOCK_SPEED if CLOCK_SPEED else 0.0
+    if real > 0:
+        time.sleep(real)
+    with _clock_lock:
+        _clock_offset += max(end - now(), 0.0)
+    if getattr(_clock_local, 't', None) is not None:
+        _clock_local.t = end
 
-console = Console()
+def sleep(seconds):
+    with timed('sleep'):
+        pass_time(seconds)
 
-def log(msg): console.print(f'[dim][{datetime.now().strftime("%H:%M:%S")}][/dim] {msg}')
-def log_ok(msg): console.print(f'[dim][{datetime.now().strftime("%H:%M:%S")}][/dim] [green]OK  {msg}[/green]')
-def log_err(msg): console.print(f'[dim][{datetime.now().strftime("%H:%M:%S")}][/dim] [red]ERR {msg}[/red]')
-def log_info(msg): console.print(f'[dim][{datetime.now().strftime("%H:%M:%S")}][/dim] [cyan]INF {msg}[/cyan]')
-def log_warn(msg): console.print(f'[dim][{datetime.now().strftime("%H:%M:%S")}][/dim] [yellow]WRN {msg}[/yellow]')
+def _log(level, template, msg):
+    if HEADLESS: emit('log', level=level, msg=strip_markup(msg))
+    elif _live is not None: live_log(f'[dim][{datetime.now().strftime("%H:%M:%S")}][/dim] ' + template.format(msg=msg))
+    else: get_console().print(f'[dim][{datetime.now().strftime("%H:%M:%S")}][/dim] ' + template.format(msg=msg))
+
+def log(msg): _log('log', '{msg}', msg)
+def log_ok(msg): _log('ok', '[green]OK  {msg}[/green]', msg)
+def log_err(msg): _log('error', '[red]ERR {msg}[/red]', msg)
+def log_info(msg): _log('info', '[cyan]INF {msg}[/cyan]', msg)
+def log_warn(msg): _log('warn', '[yellow]WRN {msg}[/yellow]', msg)
 
 def debug(label, r):
     if not DEBUG: return
-    try: console.print(f'  [dim][DEBUG] {r.status_code} {label} -> {str(r.json())[:300]}[/dim]')
-    except: console.print(f'  [dim][DEBUG] {r.status_code} {label} -> {r.text[:200]}[/dim]')
+    # headless: body tetap JSON (payload ter-decode); teks mentah hanya kalau body gagal di-decode
+    if HEADLESS: return emit('debug', status=r.status_code, label=label, body=r.text[:200] if r.text else r.data)
+    body = str(r.data)[:300] if r.data or not r.text else r.text[:200]
+    if _live is not None: live_log(f'  [dim][DEBUG] {r.status_code} {label} -> {body[:80]}[/dim]', refresh=False)
+    else: get_console().print(f'  [dim][DEBUG] {r.status_code} {label} -> {body}[/dim]')
+
+# ===== RESPONSE MODEL – BODY DI-DECODE SEKALI, ENVELOPE DINORMALISASI, RECORD RINGKAS =====
+def unwrap(data, keys, hint=None):
+    if not isinstance(data, dict):
+        return data, None
+    for k in ((hint,) if hint else ()) + tuple(keys):
+        if data.get(k):
+            return data[k], k
+    return data, None
+
+def to_float(x, default=0.0):
+    try: return float(x)
+    except (TypeError, ValueError): return default
+
+def name_of(x, default=''):
+    x = x or {}
+    return x.get('name', default) if isinstance(x, dict) else str(x)
+
+class ApiResponse:
+    __slots__ = ('status_code', 'data', 'text', 'headers', 'path', 'from_cache')
+
+    def __init__(self, status_code, data, text='', headers=None, path='', from_cache=False):
+        self.status_code = status_code
+        self.data = data
+        self.text = text
+        self.headers = headers or {}
+        self.path = path
+        self.from_cache = from_cache
+
+    @classmethod
+    def from_http(cls, r, path):
+        with timed('json'):
+            try:
+                data, text = r.json(), ''
+            except ValueError:
+                data, text = {}, r.text[:200]
+        return cls(r.status_code, data, text, r.headers, path)
+
+    def get(self, key, default=None):
+        return self.data.get(key, default) if isinstance(self.data, dict) else default
+
+    def unwrap(self, *keys):
+        return unwrap(self.data, keys)[0]
+
+class Agent:
+    __slots__ = ('id', 'name', 'rating', 'wins', 'losses')
+
+    def __init__(self, id, name='?', rating=0.0, wins=0, losses=0):
+        self.id = id
+        self.name = name
+        self.rating = rating
+        self.wins = wins
+        self.losses = losses
+
+    @classmethod
+    def from_dict(cls, d, default_id=None):
+        return cls(d.get('id') or default_id, d.get('name', '?'), to_float(d.get('rating', 0)),
+                   int(d.get('wins') or 0), int(d.get('losses') or 0))
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+class Stats:
+    __slots__ = ('battle_points',)
+
+    def __init__(self, battle_points=None):
+        self.battle_points = battle_points
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(next((d[k] for k in ('battlePoints', 'bp', 'points', 'tokens') if d.get(k) is not None), None))
 
-def safe_json(r):
-    try: return r.json()
-    except: return {}
+    def to_dict(self):
+        return {'battlePoints': self.battle_points}
+
+class Round:
+    __slots__ = ('winner',)
+
+    def __init__(self, winner=''):
+        self.winner = winner
+
+class Battle:
+    __slots__ = ('id', 'status', 'winner', 'opponent', 'rating_change', 'old_rating', 'new_rating', 'rounds', 'raw')
+
+    def __init__(self, id, status='', winner='', opponent='?', rating_change=0,
+                 old_rating=None, new_rating=None, rounds=(), raw=None):
+        self.id = id
+        self.status = status
+        self.winner = winner
+        self.opponent = opponent
+        self.rating_change = rating_change
+        self.old_rating = old_rating
+        self.new_rating = new_rating
+        self.rounds = rounds
+        # payload asli dari API (read-only, bisa jadi dipakai bareng cache conditional GET)
+        self.raw = raw
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d.get('id') or d.get('battleId'), str(d.get('status', '')).lower(),
+                   name_of(d.get('winner')), name_of(d.get('opponent'), '?'),
+                   d.get('ratingChange') or 0, d.get('oldRating'), d.get('newRating'),
+                   tuple(Round(name_of(rd.get('winner'))) for rd in d.get('rounds') or ()), d)
+
+    def to_dict(self):
+        # bentuk sama dengan payload API, hanya field yang dimodelkan
+        return {'id': self.id, 'status': self.status,
+                'winner': {'name': self.winner} if self.winner else None,
+                'opponent': {'name': self.opponent}, 'ratingChange': self.rating_change,
+                'oldRating': self.old_rating, 'newRating': self.new_rating,
+                'rounds': [{'winner': {'name': rd.winner} if rd.winner else None} for rd in self.rounds]}
 
 # ===== LOAD/SAVE ACCOUNTS =====
+# accounts.json = snapshot, accounts.json.journal = perubahan kecil (append-only) di atasnya.
+# Snapshot cuma ditulis ulang (atomic) saat compaction.
+_accounts = []
+_journal_len = 0
+
+def account_key(acc):
+    return acc.get('name') or acc['apiKey'][-8:]
+
+def write_atomic(path, obj):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(obj, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def replay_journal(data):
+    # return jumlah baris rusak (write terpotong karena crash); baris rusak dilewati, bukan menghentikan replay
+    global _journal_len
+    if not os.path.exists(JOURNAL_FILE):
+        return 0
+    by_key = {account_key(acc): acc for acc in data}
+    bad = 0
+    with open(JOURNAL_FILE) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                entry = None
+            if not isinstance(entry, dict):
+                bad += 1
+                continue
+            acc = by_key.get(entry.pop('account', None))
+            if acc is not None:
+                acc.update(entry)
+            _journal_len += 1
+    return bad
+
 def load_accounts():
+    global _accounts
     if not os.path.exists(ACCOUNTS_FILE):
         log_err('accounts.json belum ada. Isi manual dulu.')
         sys.exit(1)
@@ -49,25 +344,39 @@ def load_accounts():
     for acc in data:
         if 'token' in acc and 'apiKey' not in acc:
             acc['apiKey'] = acc.pop('token')
+    journaled = os.path.exists(JOURNAL_FILE)
+    bad = replay_journal(data)
+    for acc in data:
         acc.setdefault('battleId', None)
         acc.setdefault('agentIndex', 0)
         acc.setdefault('myAgentIds', [])
+    _accounts = data
+    if bad:
+        log_warn(f'{bad} baris journal rusak dilewati.')
+    if journaled:
+        # compact langsung: append berikutnya tidak boleh menempel ke baris yang terpotong
+        save_accounts(data)
     return data
 
-def save_accounts(accs):
-    with open(ACCOUNTS_FILE, 'w') as f:
-        json.dump(accs, f, indent=2)
+def save_accounts(accs=None):
+    # compaction: snapshot lengkap ditulis atomic, lalu journal dikosongkan
+    global _journal_len
+    accs = _accounts if accs is None else accs
+    write_atomic(ACCOUNTS_FILE, [{k: v for k, v in a.items() if not k.startswith('_')} for a in accs])
+    if os.path.exists(JOURNAL_FILE):
+        os.remove(JOURNAL_FILE)
+    _journal_len = 0
 
-def retry_request(func, max_retries=MAX_RETRIES):
-    for attempt in range(max_retries):
-        try:
-            return func()
-        except Exception as e:
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-            else:
-                log_err(f'Request gagal: {type(e).__name__}: {e}')
-    return None
+def persist(acc, **fields):
+    global _journal_len
+    acc.update(fields)
+    with open(JOURNAL_FILE, 'a') as f:
+        f.write(json.dumps({'account': account_key(acc), **fields}) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    _journal_len += 1
+    if _journal_len >= JOURNAL_COMPACT_EVERY:
+        save_accounts()
 
 def get_headers(acc):
     return {
@@ -75,28 +384,625 @@ def get_headers(acc):
         'Content-Type': 'application/json'
     }
 
+# ===== HTTP CLIENT – 1 SESSION KEEP-ALIVE PER AKUN =====
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_session(acc):
+    with _sessions_lock:
+        s = _sessions.get(acc['apiKey'])
+        if s is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            s.mount('https://', adapter)
+            s.mount('http://', adapter)
+            s.headers.update(get_headers(acc))
+            if REPLAY_FILE:
+                replay = ReplayAdapter(load_cassette(), account_hash(acc['apiKey']))
+                s.mount('https://', replay)
+                s.mount('http://', replay)
+            _sessions[acc['apiKey']] = s
+    return s
+
+def close_sessions():
+    for s in _sessions.values():
+        s.close()
+    _sessions.clear()
+    if _recorder is not None:
+        _recorder.flush()
+
+# ===== RECORD / REPLAY – CASSETTE JSONL, AUTH TIDAK PERNAH DITULIS =====
+# baris 1 header (+ state awal: akun tanpa API key, endpoint, snapshot), sisanya 1 exchange per baris:
+# waktu relatif, akun (hash API key), request, respons/exception
+CASSETTE_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Retry-After')
+SECRET_FIELDS = ('apiKey', 'token')
+_recorder = None
+_recorder_lock = threading.Lock()
+_record_start = None
+_cassette = None
+
+def account_hash(api_key):
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+def redact(headers):
+    return {k: ('REDACTED' if k.lower() in ('authorization', 'cookie') else v) for k, v in (headers or {}).items()}
+
+def record_exchange(acc, method, path, payload, headers, seconds, r=None, error=None):
+    global _recorder, _record_start
+    started = now() - seconds
+    entry = {'elapsed': round(seconds, 4), 'account': account_hash(acc['apiKey']), 'method': method,
+             'path': path, 'payload': payload, 'headers': redact(dict(get_session(acc).headers, **(headers or {})))}
+    if r is not None:
+        entry.update(status=r.status_code, responseHeaders={k: r.headers[k] for k in CASSETTE_HEADERS if k in r.headers},
+                     body=r.text)
+    else:
+        entry.update(error=type(error).__name__, kind=classify_error(error), message=str(error)[:200])
+    with _recorder_lock:
+        if _recorder is not None:
+            _recorder.write(json.dumps({'t': round(started - _record_start, 3), **entry}, ensure_ascii=False) + '\n')
+
+def start_recording(accounts):
+    global _recorder, _record_start
+    snap = {}
+    if os.path.exists(SNAPSHOT_FILE):
+        try:
+            with open(SNAPSHOT_FILE) as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            snap = {}
+    snap_accounts = snap.get('accounts', {})
+    state = {'accounts': {account_hash(a['apiKey']): {k: v for k, v in a.items()
+                                                      if k not in SECRET_FIELDS and not k.startswith('_')}
+                          for a in accounts},
+             'endpoints': load_endpoints(),
+             'snapshot': {'savedAt': snap.get('savedAt', 0),
+                          'accounts': {account_hash(a['apiKey']): snap_accounts[account_key(a)]
+                                       for a in accounts if account_key(a) in snap_accounts}}}
+    os.makedirs(os.path.dirname(RECORD_FILE) or '.', exist_ok=True)
+    with _recorder_lock:
+        _recorder = open(RECORD_FILE, 'w')
+        _record_start = now()
+        _recorder.write(json.dumps({'cassette': 2, 'baseUrl': BASE_URL, 'recordedAt': wall_clock(), 'state': state},
+                                   ensure_ascii=False) + '\n')
+
+class Cassette:
+    # GET diputar menurut waktu (respons terakhir yang terekam <= jam virtual), POST FIFO sesuai urutan rekaman
+    def __init__(self, path):
+        with open(path) as f:
+            self.header = json.loads(f.readline())
+            entries = [json.loads(line) for line in f if line.strip()]
+        self.by_key = {}
+        last_ok = {}
+        for e in entries:
+            key = (e['account'], e['method'], e['path'])
+            if e.get('status') == 200:
+                last_ok[key] = e
+            elif e.get('status') == 304 and key in last_ok:
+                e['fallback'] = last_ok[key]
+            self.by_key.setdefault(key, []).append(e)
+        self.end = max((e['t'] for e in entries), default=0.0)
+        self.start = now()
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def elapsed(self):
+        return thread_now() - self.start
+
+    def exhausted(self):
+        return self.elapsed() > self.end
+
+    def match(self, account, method, path):
+        queue = self.by_key.get((account, method, path))
+        if not queue:
+            with self.lock:
+                self.misses += 1
+            return None
+        if method != 'GET':
+            with self.lock:
+                return queue.pop(0) if len(queue) > 1 else queue[0]
+        t = self.elapsed()
+        picked = queue[0]
+        for e in queue:
+            if e['t'] > t:
+                break
+            picked = e
+        return picked
+
+def load_cassette():
+    global _cassette
+    if _cassette is None:
+        _cassette = Cassette(REPLAY_FILE)
+        log_info(f'Replay cassette {REPLAY_FILE}: {sum(map(len, _cassette.by_key.values()))} exchange, '
+                 f'{_cassette.end:.0f}s rekaman, speed {CLOCK_SPEED or "maks"}')
+    return _cassette
+
+def prepare_replay():
+    # replay tidak boleh menyentuh state asli: semua file diarahkan ke direktori scratch yang diisi
+    # state awal rekaman; waktu absolut (cooldown, battle, snapshot, unsupported) digeser ke jam replay
+    global ACCOUNTS_FILE, JOURNAL_FILE, ENDPOINTS_FILE, SNAPSHOT_FILE, HISTORY_FILE, METRICS_PROM_FILE, METRICS_JSON_FILE
+    cassette = load_cassette()
+    random.seed(cassette.header.get('recordedAt'))
+    with open(ACCOUNTS_FILE) as f:
+        mine = json.load(f)
+    state = cassette.header.get('state')
+    endpoints = {}
+    snap = None
+    if state is None:
+        log_warn(f'Cassette {REPLAY_FILE} tanpa state awal, mulai dari {ACCOUNTS_FILE} tanpa cooldown/battle.')
+        accounts = [{k: v for k, v in a.items() if k not in ('cooldowns', 'battleId', 'battleAgentId', 'battleStartedAt')}
+                    for a in mine]
+    else:
+        shift = wall_clock() - cassette.header.get('recordedAt', wall_clock())
+        keys = {account_hash(k): k for k in (a.get('apiKey') or a.get('token') for a in mine) if k}
+        accounts = []
+        for h, st in state['accounts'].items():
+            if h not in keys:
+                log_warn(f'Akun {st.get("name", h)} di rekaman tidak ada di {ACCOUNTS_FILE}, dilewati.')
+                continue
+            acc = dict(st, apiKey=keys[h])
+            if acc.get('cooldowns'):
+                acc['cooldowns'] = {aid: until + shift for aid, until in acc['cooldowns'].items()}
+            if acc.get('battleStartedAt'):
+                acc['battleStartedAt'] += shift
+            accounts.append(acc)
+        endpoints = {name: dict(e, unsupported=e['unsupported'] + shift) if e.get('unsupported') else e
+                     for name, e in state.get('endpoints', {}).items()}
+        by_hash = {account_hash(a['apiKey']): a for a in accounts}
+        recorded = state.get('snapshot') or {}
+        if recorded.get('accounts'):
+            snap = {'savedAt': recorded['savedAt'] + shift,
+                    'accounts': {account_key(by_hash[h]): e for h, e in recorded['accounts'].items() if h in by_hash}}
+    scratch = tempfile.mkdtemp(prefix='moltarena-replay-')
+    ACCOUNTS_FILE = os.path.join(scratch, 'accounts.json')
+    JOURNAL_FILE = ACCOUNTS_FILE + '.journal'
+    ENDPOINTS_FILE = os.path.join(scratch, 'endpoints.json')
+    SNAPSHOT_FILE = os.path.join(scratch, 'snapshot.json')
+    HISTORY_FILE = os.path.join(scratch, battle_history.HISTORY_FILE)
+    METRICS_PROM_FILE = os.path.join(scratch, 'metrics.prom')
+    METRICS_JSON_FILE = os.path.join(scratch, 'metrics.json')
+    write_atomic(ACCOUNTS_FILE, accounts)
+    write_atomic(ENDPOINTS_FILE, {BASE_URL: endpoints})
+    if snap:
+        write_atomic(SNAPSHOT_FILE, snap)
+    log_info(f'Replay memakai state di {scratch}, file asli tidak disentuh.')
+
+def replay_exhausted():
+    return _cassette is not None and _cassette.exhausted()
+
+class ReplayAdapter(BaseAdapter):
+    def __init__(self, cassette, account):
+        super().__init__()
+        self.cassette = cassette
+        self.account = account
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        path = request.url[len(BASE_URL):] if request.url.startswith(BASE_URL) else request.path_url
+        e = self.cassette.match(self.account, request.method, path)
+        if e is None:
+            return self.build(request, 404, {'error': 'cassette miss'}, {})
+        pass_time(e['elapsed'])
+        if 'error' in e:
+            if e.get('kind') == 'connect':
+                raise requests.exceptions.ConnectionError(
+                    MaxRetryError(None, request.url, NewConnectionError(None, e['message'])), request=request)
+            raise getattr(requests.exceptions, e['error'], requests.exceptions.ConnectionError)(e['message'], request=request)
+        if e['status'] == 304 and 'fallback' in e and \
+                request.headers.get('If-None-Match') != e['fallback']['responseHeaders'].get('ETag'):
+            e = e['fallback']
+        return self.build(request, e['status'], e['body'], e['responseHeaders'])
+
+    def build(self, request, status, body, headers):
+        r = requests.Response()
+        r.status_code = status
+        r.headers = CaseInsensitiveDict(headers)
+        r._content = (body if isinstance(body, str) else json.dumps(body)).encode()
+        r.encoding = 'utf-8'
+        r.url = request.url
+        r.request = request
+        return r
+
+    def close(self):
+        pass
+
+# ===== METRICS PER ENDPOINT – HISTOGRAM LATENCY, STATUS, RETRY, 429 =====
+_metrics = {}
+_cycle_samples = []
+_metrics_lock = threading.Lock()
+
+def endpoint_template(path):
+    path = re.sub(r'([?&]ids=)[^&]*', r'\1{ids}', path)
+    return re.sub(r'/(battles|agents)/(?!active\b|voting\b|batch\b)[^/?]+', r'/\1/{id}', path)
+
+def observe(method, path, seconds, outcome):
+    # outcome = status code (int) atau nama exception
+    key = (method, endpoint_template(path))
+    with _metrics_lock:
+        m = _metrics.get(key)
+        if m is None:
+            m = _metrics[key] = {'count': 0, 'sum': 0.0, 'buckets': [0] * len(LATENCY_BUCKETS),
+                                 'outcomes': {}, 'retries': 0}
+        m['count'] += 1
+        m['sum'] += seconds
+        for i, le in enumerate(LATENCY_BUCKETS):
+            if seconds <= le:
+                m['buckets'][i] += 1
+        m['outcomes'][str(outcome)] = m['outcomes'].get(str(outcome), 0) + 1
+        _cycle_samples.append((key, seconds, str(outcome)))
+
+def observe_retries(method, path, n):
+    if n > 0:
+        with _metrics_lock:
+            _metrics[(method, endpoint_template(path))]['retries'] += n
+
+def metrics_snapshot():
+    with _metrics_lock:
+        return [{'method': method, 'endpoint': ep, 'count': m['count'], 'sum': round(m['sum'], 6),
+                 'buckets': dict(zip(map(str, LATENCY_BUCKETS), m['buckets'])),
+                 'outcomes': dict(m['outcomes']), 'retries': m['retries'],
+                 'rate_limited': m['outcomes'].get('429', 0)}
+                for (method, ep), m in sorted(_metrics.items())]
+
+def metrics_prometheus(snapshot):
+    lines = [
+        '# HELP moltarena_request_duration_seconds Latency request API per endpoint.',
+        '# TYPE moltarena_request_duration_seconds histogram',
+    ]
+    for m in snapshot:
+        lbl = f'method="{m["method"]}",endpoint="{m["endpoint"]}"'
+        for le, n in m['buckets'].items():
+            lines.append(f'moltarena_request_duration_seconds_bucket{{{lbl},le="{le}"}} {n}')
+        lines.append(f'moltarena_request_duration_seconds_bucket{{{lbl},le="+Inf"}} {m["count"]}')
+        lines.append(f'moltarena_request_duration_seconds_sum{{{lbl}}} {m["sum"]}')
+        lines.append(f'moltarena_request_duration_seconds_count{{{lbl}}} {m["count"]}')
+    lines += ['# HELP moltarena_requests_total Request API per endpoint dan status/exception.',
+              '# TYPE moltarena_requests_total counter']
+    for m in snapshot:
+        for outcome, n in sorted(m['outcomes'].items()):
+            lines.append(f'moltarena_requests_total{{method="{m["method"]}",endpoint="{m["endpoint"]}",'
+                         f'outcome="{outcome}"}} {n}')
+    for name, field, help_ in (('retries', 'retries', 'Retry per endpoint.'),
+                               ('rate_limited', 'rate_limited', 'Respons 429 per endpoint.')):
+        lines += [f'# HELP moltarena_{name}_total {help_}', f'# TYPE moltarena_{name}_total counter']
+        for m in snapshot:
+            lines.append(f'moltarena_{name}_total{{method="{m["method"]}",endpoint="{m["endpoint"]}"}} {m[field]}')
+    return '\n'.join(lines) + '\n'
+
+@scoped
+def export_metrics():
+    snapshot = metrics_snapshot()
+    try:
+        write_atomic(METRICS_JSON_FILE, {'generatedAt': time.time(), 'endpoints': snapshot})
+        tmp = f'{METRICS_PROM_FILE}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(metrics_prometheus(snapshot))
+        os.replace(tmp, METRICS_PROM_FILE)
+    except OSError as e:
+        log_warn(f'Gagal tulis metrics: {e}')
+
+def drain_cycle_samples():
+    with _metrics_lock:
+        samples = list(_cycle_samples)
+        _cycle_samples.clear()
+    return samples
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+# ===== CONDITIONAL GET – ETag / Last-Modified PER URL =====
+_validators = OrderedDict()
+_validators_lock = threading.Lock()
+cond_stats = {'sent': 0, 'hits': 0}
+
+def conditional_headers(key):
+    with _validators_lock:
+        cached = _validators.get(key)
+        if not cached:
+            return None
+        headers = {}
+        if cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached['modified']:
+            headers['If-Modified-Since'] = cached['modified']
+        cond_stats['sent'] += 1
+    return headers
+
+def apply_validators(key, r):
+    with _validators_lock:
+        cached = _validators.get(key)
+        if r.status_code == 304 and cached:
+            # body cache dipakai bareng semua pemanggil, jangan dimutasi
+            cond_stats['hits'] += 1
+            _validators.move_to_end(key)
+            return ApiResponse(200, cached['body'], '', r.headers, r.path, from_cache=True)
+        if r.status_code == 200:
+            etag = r.headers.get('ETag')
+            modified = r.headers.get('Last-Modified')
+            if etag or modified:
+                _validators[key] = {'etag': etag, 'modified': modified, 'body': r.data}
+                _validators.move_to_end(key)
+                while len(_validators) > CONDITIONAL_CACHE_SIZE:
+                    _validators.popitem(last=False)
+            else:
+                _validators.pop(key, None)
+    return r
+
+# ===== RETRY – KLASIFIKASI ERROR, BACKOFF + JITTER, BUDGET GLOBAL, CIRCUIT BREAKER =====
+# connect : koneksi gagal dibuka, request belum sampai server -> aman diulang untuk semua method
+# timeout : server mungkin sudah memproses -> hanya diulang kalau idempoten
+# reset   : koneksi putus setelah request terkirim -> sama seperti timeout
+# 5xx     : server error -> hanya diulang kalau idempoten
+RETRYABLE_STATUS = (500, 502, 503, 504)
+_retry_lock = threading.Lock()
+_retry_tokens = [float(RETRY_BUDGET_MAX)]
+_breakers = {}
+retry_stats = {'retries': 0, 'budget_denied': 0, 'short_circuit': 0}
+
+def classify_error(e):
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return 'connect'
+    if isinstance(e, requests.exceptions.Timeout):
+        return 'timeout'
+    if isinstance(e, requests.exceptions.ConnectionError):
+        reason = getattr(e.args[0], 'reason', None) if e.args else None
+        return 'connect' if isinstance(reason, NewConnectionError) else 'reset'
+    return None
+
+def is_idempotent(method, path):
+    return method == 'GET' or path.split('?')[0] not in NON_IDEMPOTENT
+
+def should_retry(kind, idempotent):
+    return kind == 'connect' or (idempotent and kind in ('timeout', 'reset', '5xx'))
+
+def spend_retry_budget():
+    # token bucket: tiap request baru nambah RETRY_BUDGET_RATIO token, tiap retry makan 1
+    with _retry_lock:
+        if _retry_tokens[0] < 1:
+            retry_stats['budget_denied'] += 1
+            return False
+        _retry_tokens[0] -= 1
+        retry_stats['retries'] += 1
+        return True
+
+def backoff(attempt):
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** attempt))
+
+def breaker_allow(key):
+    with _retry_lock:
+        b = _breakers.get(key)
+        if not b or b['open_until'] is None:
+            return True
+        if now() < b['open_until']:
+            retry_stats['short_circuit'] += 1
+            return False
+        # half-open: loloskan satu request percobaan, sisanya tetap ditolak sampai hasilnya jelas
+        b['open_until'] = now() + BREAKER_COOLDOWN
+        return True
+
+def breaker_record(key, ok):
+    with _retry_lock:
+        b = _breakers.setdefault(key, {'failures': 0, 'open_until': None})
+        was_open = b['open_until'] is not None
+        if ok:
+            b['failures'], b['open_until'] = 0, None
+        else:
+            b['failures'] += 1
+            if b['failures'] >= BREAKER_THRESHOLD:
+                b['open_until'] = now() + BREAKER_COOLDOWN
+    if ok and was_open:
+        log_info(f'Circuit {key[0]} {key[1]} pulih')
+    elif not ok and b['open_until'] is not None:
+        log_warn(f'Circuit {key[0]} {key[1]} dibuka {BREAKER_COOLDOWN}s setelah {b["failures"]} kegagalan beruntun')
+
+def retry_request(func, method, path, max_retries=MAX_RETRIES):
+    key = (method, endpoint_template(path))
+    if not breaker_allow(key):
+        return None
+    idempotent = is_idempotent(method, path)
+    with _retry_lock:
+        _retry_tokens[0] = min(RETRY_BUDGET_MAX, _retry_tokens[0] + RETRY_BUDGET_RATIO)
+    for attempt in range(max_retries):
+        r = kind = None
+        try:
+            r = func()
+            if r.status_code in RETRYABLE_STATUS:
+                kind, err = '5xx', f'HTTP {r.status_code}'
+        except Exception as e:
+            kind, err = classify_error(e), f'{type(e).__name__}: {e}'
+            if kind is None:
+                log_err(f'Request gagal: {err}')
+                return None
+        if kind is None:
+            breaker_record(key, True)
+            return r
+        if (attempt == max_retries - 1 or not should_retry(kind, idempotent)
+                or not spend_retry_budget()):
+            break
+        sleep(backoff(attempt))
+    breaker_record(key, False)
+    if r is not None:
+        return r
+    log_err(f'Request gagal ({kind}): {err}')
+    if not idempotent and kind != 'connect':
+        log_warn(f'{method} {path} mungkin sudah diproses server, tidak dikirim ulang')
+    return None
+
+def api_request(acc, method, path, payload=None):
+    s = get_session(acc)
+    key = (acc['apiKey'], path) if method == 'GET' else None
+    headers = conditional_headers(key) if key else None
+    attempts = []
+    def send():
+        count('requests')
+        attempts.append(1)
+        t = time.perf_counter()
+        try:
+            with timed('network'):
+                r = s.request(
+                    method,
+                    f'{BASE_URL}{path}',
+                    json=payload,
+                    headers=headers,
+                    timeout=REQUEST_TIMEOUT
+                )
+        except Exception as e:
+            observe(method, path, time.perf_counter() - t, type(e).__name__)
+            if RECORD_FILE:
+                record_exchange(acc, method, path, payload, headers, time.perf_counter() - t, error=e)
+            raise
+        observe(method, path, time.perf_counter() - t, r.status_code)
+        if RECORD_FILE:
+            record_exchange(acc, method, path, payload, headers, time.perf_counter() - t, r=r)
+        return r
+    r = retry_request(send, method, path)
+    observe_retries(method, path, len(attempts) - 1)
+    if r is None:
+        return None
+    r = ApiResponse.from_http(r, path)
+    return r if key is None else apply_validators(key, r)
+
+def api_get(acc, path):
+    return api_request(acc, 'GET', path)
+
+def api_post(acc, path, payload):
+    return api_request(acc, 'POST', path, payload)
+
+# ===== ENDPOINT DISCOVERY – INGAT ENDPOINT + ENVELOPE YANG BERHASIL =====
+_endpoints = None
+_endpoints_lock = threading.Lock()
+
+def load_endpoints():
+    # dipakai juga oleh thread revalidasi: load pertama dan semua perubahan lewat _endpoints_lock
+    global _endpoints
+    with _endpoints_lock:
+        if _endpoints is None:
+            _endpoints = {}
+            if os.path.exists(ENDPOINTS_FILE):
+                try:
+                    with open(ENDPOINTS_FILE) as f:
+                        _endpoints = json.load(f)
+                except (OSError, ValueError) as e:
+                    log_warn(f'{ENDPOINTS_FILE} tidak bisa dibaca ({e}), probe ulang.')
+        return _endpoints.setdefault(BASE_URL, {})
+
+def remember_endpoint(name, entry):
+    cache = load_endpoints()
+    with _endpoints_lock:
+        cache[name] = entry
+        write_atomic(ENDPOINTS_FILE, _endpoints)
+
+def discover(acc, name, candidates, handle, optional=False):
+    # candidates: [(method, path, payload)], handle(r, known) -> (hasil, envelope) | None
+    # known = entry cache kalau kandidat ini yang diingat, selain itu None
+    # optional: kalau semua kandidat pasti tidak ada (404/405, atau 200 yang ditolak handle), ingat
+    # sebagai tidak didukung selama UNSUPPORTED_TTL supaya tidak di-probe tiap kali; 401/403/429/5xx
+    # bukan jawaban soal route jadi tidak dihitung
+    cache = load_endpoints()
+    known = cache.get(name)
+    if known and known.get('unsupported') and wall_clock() - known['unsupported'] < UNSUPPORTED_TTL:
+        return None
+    rejected = 0
+    order = list(range(len(candidates)))
+    idx = known.get('index') if known else None
+    if idx in order:
+        order.remove(idx)
+        order.insert(0, idx)
+    for i in order:
+        method, path, payload = candidates[i]
+        r = api_request(acc, method, path, payload)
+        if r is None:
+            continue
+        res = handle(r, known if i == idx else None)
+        if res is None:
+            rejected += r.status_code in (200, 404, 405)
+            continue
+        result, envelope = res
+        if i != idx or envelope != known.get('envelope'):
+            remember_endpoint(name, {'index': i, 'endpoint': f'{method} {path}', 'envelope': envelope})
+        return result
+    if optional and rejected == len(candidates):
+        remember_endpoint(name, {'unsupported': round(wall_clock())})
+    return None
+
 # ===== AGENTS – HANYA DARI myAgentIds =====
-def get_agent_detail(agent_id, acc):
-    r = retry_request(lambda: requests.get(
-        f'{BASE_URL}/agents/{agent_id}',
-        headers=get_headers(acc),
-        timeout=REQUEST_TIMEOUT
-    ))
+@scoped
+def get_agent_detail(agent_id, acc, gone=None):
+    # gone: set yang diisi agent_id kalau server pasti menjawab 404 (bukan error jaringan/breaker)
+    r = api_get(acc, f'/agents/{agent_id}')
     if r is None:
         return None
     debug(f'GET /agents/{agent_id[:8]}...', r)
+    if r.status_code == 404 and gone is not None:
+        gone.add(agent_id)
     if r.status_code == 200:
-        data = safe_json(r)
-        return data.get('agent') or data.get('data') or data
+        data = r.unwrap('agent', 'data')
+        return Agent.from_dict(data, agent_id) if isinstance(data, dict) else None
     return None
 
-def get_my_agents(acc):
+# cache in-memory: agent_id -> {'agent', 'fetched', 'stale'}, apiKey -> {'stats', 'fetched'}
+_agent_cache = {}
+_stats_cache = {}
+
+def cache_fresh(entry, max_age):
+    return (entry is not None and max_age is not None and not entry.get('stale')
+            and now() - entry['fetched'] < max_age)
+
+def get_agents_bulk(acc, agent_ids):
+    wanted = set(agent_ids)
+    ids = ','.join(agent_ids)
+    def handle(r, known):
+        if r.status_code != 200:
+            return None
+        items, key = unwrap(r.data, ('agents', 'data', 'results'), known and known.get('envelope'))
+        if not isinstance(items, list):
+            return None
+        agents = [Agent.from_dict(d) for d in items if isinstance(d, dict)]
+        # endpoint yang mengabaikan filter ids (misal listing/leaderboard) bukan bulk
+        if not agents or any(a.id not in wanted for a in agents):
+            return None
+        return {a.id: a for a in agents}, key
+    candidates = [
+        ('GET',  f'/agents?ids={ids}',       None),
+        ('GET',  f'/agents/batch?ids={ids}', None),
+        ('POST', '/agents/batch',            {'ids': list(agent_ids)}),
+    ]
+    return discover(acc, 'agents_bulk', candidates, handle, optional=True)
+
+def fetch_agents(acc, agent_ids, gone=None):
+    # 1 request bulk kalau API punya; sisanya lewat worker pool kecil di atas pool koneksi session
+    agents = (get_agents_bulk(acc, agent_ids) if len(agent_ids) > 1 else None) or {}
+    rest = [aid for aid in agent_ids if aid not in agents]
+    if len(rest) == 1:
+        agents[rest[0]] = get_agent_detail(rest[0], acc, gone)
+    elif rest:
+        t = thread_now()
+        def fetch(aid):
+            with clock_from(t):
+                return get_agent_detail(aid, acc, gone)
+        with ThreadPoolExecutor(max_workers=min(AGENT_WORKERS, len(rest))) as pool:
+            agents.update(zip(rest, pool.map(fetch, rest)))
+    return agents
+
+@scoped
+def get_my_agents(acc, max_age=None):
+    # max_age=None -> selalu fetch; selain itu pakai cache yang belum basi/expired
     my_ids = acc.get('myAgentIds', [])
+    cached = {}
+    for aid in my_ids:
+        entry = _agent_cache.get(aid)
+        if cache_fresh(entry, max_age):
+            cached[aid] = entry['agent']
+    gone = set()
+    fetched = fetch_agents(acc, [aid for aid in my_ids if aid not in cached], gone)
     agents = []
     for aid in my_ids:
-        ag = get_agent_detail(aid, acc)
+        ag = cached.get(aid) or fetched.get(aid)
+        if aid in fetched and ag:
+            _agent_cache[aid] = {'agent': ag, 'fetched': now(), 'stale': False}
+        elif not ag and aid not in gone and aid in _agent_cache:
+            # refetch gagal sementara (jaringan, 5xx, breaker terbuka): pakai data lama, entry tetap basi
+            ag = _agent_cache[aid]['agent']
         if ag:
-            ag['id'] = ag.get('id') or aid
             agents.append(ag)
         else:
             log_warn(f'Agent ID {aid[:8]}... tidak ditemukan, skip.')
@@ -104,114 +1010,316 @@ def get_my_agents(acc):
         log_err('Tidak ada agent dari myAgentIds yang berhasil dimuat. Cek accounts.json.')
     return agents
 
-def get_account_stats(acc):
-    for ep in ['/account/stats', '/account', '/me', '/profile']:
-        r = retry_request(lambda ep=ep: requests.get(
-            f'{BASE_URL}{ep}',
-            headers=get_headers(acc),
-            timeout=REQUEST_TIMEOUT
-        ))
-        if r and r.status_code == 200:
-            data = safe_json(r)
-            inner = data.get('data') or data.get('account') or data.get('user') or data
-            if DEBUG:
-                console.print(f'  [dim][STATS DEBUG] {ep} -> keys: {list(inner.keys())}[/dim]')
-            return inner
-    return {}
+def mark_stale(agent_id):
+    if agent_id in _agent_cache:
+        _agent_cache[agent_id]['stale'] = True
+
+def apply_battle_result(agent_id, bd):
+    # update rating + W/L dari payload battle; kalau tidak cocok dengan cache -> fetch ulang nanti
+    entry = _agent_cache.get(agent_id)
+    if entry is None:
+        return
+    ag = entry['agent']
+    new_r = to_float(bd.new_rating, None)
+    old_r = to_float(bd.old_rating, None)
+    if not bd.winner or new_r is None or (old_r is not None and abs(old_r - ag.rating) >= 0.5):
+        entry['stale'] = True
+        return
+    if bd.winner == ag.name:
+        ag.wins += 1
+    else:
+        ag.losses += 1
+    ag.rating = new_r
+
+@scoped
+def get_account_stats(acc, max_age=None):
+    entry = _stats_cache.get(acc['apiKey'])
+    if cache_fresh(entry, max_age):
+        return entry['stats']
+    stats = fetch_account_stats(acc)
+    if stats is None:
+        return entry['stats'] if entry else Stats()
+    _stats_cache[acc['apiKey']] = {'stats': stats, 'fetched': now()}
+    return stats
+
+def fetch_account_stats(acc):
+    def handle(r, known):
+        if r.status_code != 200:
+            return None
+        inner, key = unwrap(r.data, ('data', 'account', 'user'),
+                            known and known.get('envelope'))
+        if not isinstance(inner, dict):
+            return None
+        if DEBUG and HEADLESS:
+            emit('debug', label=f'STATS {r.path}', keys=list(inner.keys()))
+        elif DEBUG and _live is not None:
+            live_log(f'  [dim][STATS DEBUG] {r.path} -> keys: {list(inner.keys())}[/dim]', refresh=False)
+        elif DEBUG:
+            get_console().print(f'  [dim][STATS DEBUG] {r.path} -> keys: {list(inner.keys())}[/dim]')
+        return Stats.from_dict(inner), key
+    eps = ['/account/stats', '/account', '/me', '/profile']
+    return discover(acc, 'stats', [('GET', ep, None) for ep in eps], handle)
+
+# ===== WARM START – SNAPSHOT AGENT + STATS DI DISK, REVALIDASI DI BACKGROUND =====
+_snapshot = None
+_revalidated = deque()
+_revalidator = None
+_revalidate_retry = []
+_revalidate_at = None
+
+def save_snapshot(accounts):
+    snap = {'savedAt': round(wall_clock(), 1), 'accounts': {
+        account_key(acc): {'agents': [a.to_dict() for a in acc['_agents']],
+                           'stats': (acc.get('_stats') or Stats()).to_dict()}
+        for acc in accounts if acc.get('_agents')}}
+    try:
+        write_atomic(SNAPSHOT_FILE, snap)
+    except OSError as e:
+        log_warn(f'Gagal tulis snapshot: {e}')
+
+def load_snapshot(acc):
+    # snapshot hanya dipakai kalau mencakup semua myAgentIds akun ini; cache diisi sesuai umurnya
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = {'savedAt': 0, 'accounts': {}}
+        if os.path.exists(SNAPSHOT_FILE):
+            try:
+                with open(SNAPSHOT_FILE) as f:
+                    _snapshot = json.load(f)
+            except (OSError, ValueError) as e:
+                log_warn(f'{SNAPSHOT_FILE} tidak bisa dibaca ({e}), validasi penuh.')
+    age = wall_clock() - _snapshot.get('savedAt', 0)
+    entry = _snapshot.get('accounts', {}).get(account_key(acc))
+    if not entry or age > SNAPSHOT_MAX_AGE:
+        return None
+    by_id = {d.get('id'): d for d in entry.get('agents', [])}
+    ids = acc.get('myAgentIds', [])
+    if not ids or any(aid not in by_id for aid in ids):
+        return None
+    agents = [Agent.from_dict(by_id[aid], aid) for aid in ids]
+    stats = Stats.from_dict(entry.get('stats') or {})
+    fetched = now() - age
+    for a in agents:
+        _agent_cache[a.id] = {'agent': a, 'fetched': fetched, 'stale': False}
+    _stats_cache[acc['apiKey']] = {'stats': stats, 'fetched': fetched}
+    return agents, stats, age
+
+def revalidate(accounts):
+    # thread hanya fetch mentah; cache agent/stats dan akun diubah di main loop (apply_revalidated)
+    global _revalidator
+    t = now()
+    def run():
+        with clock_from(t):
+            for acc in accounts:
+                gone = set()
+                try:
+                    agents = fetch_agents(acc, acc.get('myAgentIds', []), gone)
+                    _revalidated.append((acc, agents, gone, fetch_account_stats(acc)))
+                except Exception as e:
+                    log_warn(f'Revalidasi {acc.get("name")} gagal: {type(e).__name__}: {e}')
+                    _revalidated.append((acc, {}, set(), None))
+    _revalidator = threading.Thread(target=run, name='revalidate', daemon=True)
+    _revalidator.start()
+
+def revalidating():
+    return _revalidator is not None and _revalidator.is_alive()
+
+def next_revalidate_at():
+    return _revalidate_at if _revalidate_retry else None
+
+def retry_revalidate(acc):
+    global _revalidate_at
+    if not any(a is acc for a in _revalidate_retry):
+        _revalidate_retry.append(acc)
+    _revalidate_at = now() + REVALIDATE_RETRY
+
+def apply_revalidated(valid):
+    # dipanggil dari main loop: data segar dari thread background menggantikan isi snapshot.
+    # akun hanya dilepas kalau semua agent-nya pasti 404; gagal sementara (jaringan, 5xx, breaker
+    # terbuka) atau battle masih jalan -> data snapshot tetap dipakai, revalidasi diulang nanti
+    changed = False
+    while _revalidated:
+        acc, fetched, gone, stats = _revalidated.popleft()
+        ids = acc.get('myAgentIds', [])
+        if ids and all(aid in gone for aid in ids):
+            if battle_of(acc) is None:
+                log_err(f'{acc.get("name")} -- semua agent dari myAgentIds 404, akun dilepas.')
+                valid[:] = [a for a in valid if a is not acc]
+            else:
+                log_warn(f'{acc.get("name")} -- semua agent 404, battle masih jalan; dicek ulang {REVALIDATE_RETRY}s lagi')
+                retry_revalidate(acc)
+            continue
+        old = {a.id: a for a in acc['_agents']}
+        agents = []
+        for aid in ids:
+            ag = fetched.get(aid)
+            if ag:
+                _agent_cache[aid] = {'agent': ag, 'fetched': now(), 'stale': False}
+                agents.append(ag)
+            elif aid in gone:
+                log_warn(f'Agent ID {aid[:8]}... 404, dilepas.')
+            elif aid in old:
+                agents.append(old[aid])
+        if stats is not None:
+            _stats_cache[acc['apiKey']] = {'stats': stats, 'fetched': now()}
+            acc['_stats'] = stats
+        acc['_agents'] = agents
+        if stats is None or any(not fetched.get(aid) and aid not in gone for aid in ids):
+            log_warn(f'{acc.get("name")} -- revalidasi belum lengkap, pakai snapshot, ulang {REVALIDATE_RETRY}s lagi')
+            retry_revalidate(acc)
+        else:
+            log_ok(f'{acc.get("name")} -- snapshot diperbarui dari server')
+        display_account_stats(acc.get('name'), acc['_stats'], agents)
+        display_agents_table(agents, acc.get('agentIndex', 0), acc.get('name'))
+        changed = True
+    if changed:
+        save_snapshot(valid)
+    if _revalidate_retry and not revalidating() and now() >= _revalidate_at:
+        retry = [acc for acc in _revalidate_retry if any(a is acc for a in valid)]
+        _revalidate_retry.clear()
+        if retry:
+            revalidate(retry)
+
+# ===== SCHEDULER – DEADLINE PER AGENT (CLOCK MONOTONIC) =====
+_next_eligible = {}
+
+def now():
+    return time.monotonic() + _clock_offset
+
+def wall_clock():
+    return time.time() + _clock_offset
+
+def eligible_at(agent_id):
+    return _next_eligible.get(agent_id, 0.0)
+
+def set_cooldown(agent_ids, seconds):
+    until = now() + seconds
+    for aid in agent_ids:
+        _next_eligible[aid] = max(eligible_at(aid), until)
+
+def account_agent_ids(acc):
+    return [a.id for a in acc.get('_agents', [])] or list(acc.get('myAgentIds', []))
+
+def cool_down_account(acc, seconds):
+    # cooldown disimpan sebagai epoch (wall clock) supaya tetap berlaku setelah restart
+    ids = account_agent_ids(acc)
+    set_cooldown(ids, seconds)
+    wall = wall_clock() - now()
+    persist(acc, cooldowns={aid: round(eligible_at(aid) + wall, 1) for aid in ids})
+
+def restore_cooldowns(acc):
+    wall = wall_clock()
+    for aid, until in (acc.get('cooldowns') or {}).items():
+        if until > wall:
+            set_cooldown([aid], until - wall)
+
+def parse_retry_after(data):
+    wait = None
+    try:
+        wait = float(data['retryAfter'])
+    except (KeyError, TypeError, ValueError):
+        pass
+    next_at = data.get('nextAvailableAt')
+    if next_at:
+        try:
+            at = datetime.fromisoformat(str(next_at).replace('Z', '+00:00'))
+            if at.tzinfo is None:
+                at = at.replace(tzinfo=timezone.utc)
+            wait = max(wait or 0.0, (at - datetime.now(timezone.utc)).total_seconds())
+        except ValueError:
+            pass
+    if wait is None:
+        wait = DEFAULT_RETRY_AFTER
+    return max(wait, 0.0) + RATE_LIMIT_MARGIN
+
+def next_agent(acc):
+    # rotasi mulai dari agentIndex, ambil agent yang cooldown-nya paling cepat habis
+    agents = acc.get('_agents', [])
+    if not agents:
+        return None, None
+    start = acc.get('agentIndex', 0) % len(agents)
+    order = [(start + i) % len(agents) for i in range(len(agents))]
+    idx = min(order, key=lambda i: eligible_at(agents[i].id))
+    return idx, agents[idx]
+
+def due_accounts(accounts):
+    return [acc for acc in accounts
+            if acc.get('_agents') and eligible_at(next_agent(acc)[1].id) <= now()]
+
+def seconds_until_next(accounts):
+    deadlines = [eligible_at(next_agent(acc)[1].id) for acc in accounts if acc.get('_agents')]
+    if not deadlines:
+        return BATTLE_INTERVAL
+    return max(min(deadlines) - now(), 0.0)
 
 # ===== BATTLE =====
+@scoped
 def start_battle(acc, agent_id):
     payload = {'agent1Id': agent_id, 'rounds': ROUNDS, 'strategy': STRATEGY}
-    r = retry_request(lambda: requests.post(
-        f'{BASE_URL}/deploy/battle',
-        headers=get_headers(acc),
-        json=payload,
-        timeout=REQUEST_TIMEOUT
-    ))
+    r = api_post(acc, '/deploy/battle', payload)
     if r is None:
         return None
     debug('POST /deploy/battle', r)
+    # limit battle dihitung server per API key, jadi cooldown berlaku untuk semua agent di akun
     if r.status_code in (200, 201):
-        data = safe_json(r)
-        battle = data.get('battle') or data.get('data') or data
-        return battle.get('id') or battle.get('battleId')
+        cool_down_account(acc, BATTLE_INTERVAL)
+        battle = r.unwrap('battle', 'data')
+        return (battle.get('id') or battle.get('battleId')) if isinstance(battle, dict) else None
     if r.status_code == 429:
-        data = safe_json(r)
-        wait = int(data.get('retryAfter', 610)) + 10
+        data = r.data if isinstance(r.data, dict) else {}
+        wait = parse_retry_after(data)
+        cool_down_account(acc, wait)
         next_at = data.get('nextAvailableAt', '-')
-        log_warn(f'Rate limited! Next: {next_at} | Tunggu {wait}s...')
-        time.sleep(wait)
-        r2 = retry_request(lambda: requests.post(
-            f'{BASE_URL}/deploy/battle',
-            headers=get_headers(acc),
-            json=payload,
-            timeout=REQUEST_TIMEOUT
-        ))
-        if r2 and r2.status_code in (200, 201):
-            d2 = safe_json(r2)
-            b2 = d2.get('battle') or d2.get('data') or d2
-            return b2.get('id') or b2.get('battleId')
+        log_warn(f'Rate limited! Next: {next_at} | Dijadwal ulang dalam {wait:.0f}s')
     return None
 
+@scoped
 def get_battle_status(battle_id, acc):
-    r = retry_request(lambda: requests.get(
-        f'{BASE_URL}/battles/{battle_id}',
-        headers=get_headers(acc),
-        timeout=REQUEST_TIMEOUT
-    ))
+    r = api_get(acc, f'/battles/{battle_id}')
     if r is None:
-        return {}
+        return None
     debug(f'GET /battles/{str(battle_id)[:8]}...', r)
-    return safe_json(r).get('data') or safe_json(r)
+    data = r.unwrap('data')
+    return Battle.from_dict(data) if isinstance(data, dict) else None
 
 # ===== VOTE =====
+@scoped
 def get_active_battles(acc):
-    battles = []
-    for ep in ['/battles?status=voting', '/battles?status=active',
-               '/battles/active', '/battles/voting', '/battles?limit=50']:
-        r = retry_request(lambda ep=ep: requests.get(
-            f'{BASE_URL}{ep}',
-            headers=get_headers(acc),
-            timeout=REQUEST_TIMEOUT
-        ))
-        if r is None:
-            continue
-        debug(f'GET {ep}', r)
-        if r.status_code == 200:
-            data = safe_json(r)
-            items = data.get('battles') or data.get('data') or data.get('results') or []
-            if isinstance(items, list) and items:
-                battles = items
-                break
-    return battles
+    def handle(r, known):
+        debug(f'GET {r.path}', r)
+        if r.status_code != 200:
+            return None
+        items, key = unwrap(r.data, ('battles', 'data', 'results'),
+                            known and known.get('envelope'))
+        # endpoint yang sudah diingat boleh balikin list kosong (memang tidak ada battle)
+        if isinstance(items, list) and (items or known):
+            return items, key
+        return None
+    eps = ['/battles?status=voting', '/battles?status=active',
+           '/battles/active', '/battles/voting', '/battles?limit=50']
+    return discover(acc, 'active_battles', [('GET', ep, None) for ep in eps], handle) or []
 
+@scoped
 def cast_vote(acc, battle_id, agent_id):
     endpoints_payloads = [
-        (f'/battles/{battle_id}/vote',       {'agentId': agent_id}),
-        (f'/battles/{battle_id}/vote',       {'votedAgentId': agent_id}),
-        (f'/vote',                           {'battleId': battle_id, 'agentId': agent_id}),
-        (f'/battles/{battle_id}/cast-vote',  {'agentId': agent_id}),
+        ('POST', f'/battles/{battle_id}/vote',       {'agentId': agent_id}),
+        ('POST', f'/battles/{battle_id}/vote',       {'votedAgentId': agent_id}),
+        ('POST', f'/vote',                           {'battleId': battle_id, 'agentId': agent_id}),
+        ('POST', f'/battles/{battle_id}/cast-vote',  {'agentId': agent_id}),
     ]
-    for ep, payload in endpoints_payloads:
-        r = retry_request(lambda ep=ep, p=payload: requests.post(
-            f'{BASE_URL}{ep}',
-            headers=get_headers(acc),
-            json=p,
-            timeout=REQUEST_TIMEOUT
-        ))
-        if r is None:
-            continue
-        debug(f'POST {ep}', r)
+    def handle(r, known):
+        debug(f'POST {r.path}', r)
         if r.status_code in (200, 201):
-            return True, safe_json(r)
+            return (True, r.data), None
         if r.status_code == 400:
-            data = safe_json(r)
-            if 'already' in str(data).lower():
-                return 'already_voted', data
-    return False, {}
+            if 'already' in str(r.data).lower():
+                return ('already_voted', r.data), None
+        return None
+    return discover(acc, 'vote', endpoints_payloads, handle) or (False, {})
 
+@scoped
 def run_auto_vote(acc):
-    console.rule('[bold magenta]AUTO VOTE[/bold magenta]')
+    rule('[bold magenta]AUTO VOTE[/bold magenta]')
     battles = get_active_battles(acc)
     if not battles:
         log_warn('Tidak ada battle aktif untuk di-vote.')
@@ -221,10 +1329,7 @@ def run_auto_vote(acc):
     skipped = 0
     failed = 0
     limit = min(len(battles), MAX_VOTE_PER_CYCLE)
-    table = Table(box=box.SIMPLE_HEAD, show_header=True, padding=(0, 2))
-    table.add_column('Battle',   style='dim',   width=10)
-    table.add_column('Vote For', style='cyan',  min_width=16)
-    table.add_column('Status',   style='bold',  width=14)
+    rows = []
     for battle in battles[:limit]:
         battle_id = battle.get('id', '')
         participants = battle.get('participants') or {}
@@ -232,7 +1337,7 @@ def run_auto_vote(acc):
         a2 = participants.get('agent2') or battle.get('agent2') or {}
         candidates = [a for a in (a1, a2) if a.get('id')]
         if not candidates:
-            table.add_row(str(battle_id)[:8], '-', '[dim]no agents[/dim]')
+            rows.append((battle_id, '-', 'no agents'))
             skipped += 1
             continue
         pick = random.choice(candidates)
@@ -242,27 +1347,58 @@ def run_auto_vote(acc):
         if result is True:
             bp_gain = (resp.get('data') or resp).get('pointsEarned', '')
             bp_str = f' +{bp_gain}BP' if bp_gain else ''
-            table.add_row(str(battle_id)[:8], pick_name, f'[green]VOTED{bp_str}[/green]')
+            rows.append((battle_id, pick_name, f'VOTED{bp_str}'))
             voted += 1
         elif result == 'already_voted':
-            table.add_row(str(battle_id)[:8], pick_name, '[dim]already[/dim]')
+            rows.append((battle_id, pick_name, 'already'))
             skipped += 1
         else:
-            table.add_row(str(battle_id)[:8], pick_name, '[red]FAIL[/red]')
+            rows.append((battle_id, pick_name, 'FAIL'))
             failed += 1
-        time.sleep(random.uniform(*VOTE_DELAY))
-    console.print(table)
-    console.print(Panel(
+        idle(random.uniform(*VOTE_DELAY))
+    display_vote_result(acc.get('name'), rows, voted, skipped, failed)
+    return voted, failed
+
+# ===== DISPLAY =====
+@scoped
+@timed('render')
+def display_vote_result(acc_name, rows, voted, skipped, failed):
+    if HEADLESS:
+        emit('vote_summary', account=acc_name, voted=voted, skipped=skipped, failed=failed,
+             votes=[{'battleId': b, 'agent': n, 'status': st} for b, n, st in rows])
+        return
+    if _live is not None:
+        _live_footer['vote'] = f'{acc_name}: {voted} voted / {skipped} skip / {failed} fail'
+        return
+    from rich.table import Table
+    from rich.panel import Panel
+    from rich import box
+    styles = {'already': '[dim]already[/dim]', 'no agents': '[dim]no agents[/dim]', 'FAIL': '[red]FAIL[/red]'}
+    table = Table(box=box.SIMPLE_HEAD, show_header=True, padding=(0, 2))
+    table.add_column('Battle',   style='dim',   width=10)
+    table.add_column('Vote For', style='cyan',  min_width=16)
+    table.add_column('Status',   style='bold',  width=14)
+    for battle_id, name, status in rows:
+        table.add_row(str(battle_id)[:8], name, styles.get(status, f'[green]{status}[/green]'))
+    get_console().print(table)
+    get_console().print(Panel(
         f'[green]Voted  : {voted}[/green]\n[dim]Skipped: {skipped}[/dim]\n[red]Failed : {failed}[/red]',
         title='Vote Summary',
         border_style='magenta',
         box=box.ROUNDED,
         padding=(0, 3)
     ))
-    return voted, failed
 
-# ===== DISPLAY =====
-def display_agents_table(agents, current_idx):
+@scoped
+@timed('render')
+def display_agents_table(agents, current_idx, acc_name=None):
+    if HEADLESS:
+        emit('agents', account=acc_name, agents=[dict(a.to_dict(), current=idx == current_idx) for idx, a in enumerate(agents)])
+        return
+    if _live is not None:
+        return  # dashboard membaca agent langsung dari akun
+    from rich.table import Table
+    from rich import box
     table = Table(title='My Agents', box=box.ROUNDED, border_style='cyan', padding=(0, 2))
     table.add_column('#',      style='dim',        width=3)
     table.add_column('Nama',   style='bold white', min_width=14)
@@ -272,57 +1408,75 @@ def display_agents_table(agents, current_idx):
     table.add_column('WR%',    style='magenta',    justify='right')
     table.add_column('Status', style='bold',       justify='center')
     for idx, a in enumerate(agents):
-        wins = a.get('wins', 0)
-        losses = a.get('losses', 0)
+        wins = a.wins
+        losses = a.losses
         total = wins + losses
         wr = f'{round(wins / total * 100)}%' if total > 0 else '-'
-        rating = str(round(float(a.get('rating', 0)), 1))
+        rating = str(round(a.rating, 1))
         status = '[bold green]GILIRAN[/bold green]' if idx == current_idx else '[dim]standby[/dim]'
-        table.add_row(str(idx + 1), a.get('name', '?'), rating,
+        table.add_row(str(idx + 1), a.name, rating,
                       str(wins), str(losses), wr, status)
-    console.print(table)
+    get_console().print(table)
 
+@scoped
+@timed('render')
 def display_account_stats(acc_name, stats, agents):
-    bp = (stats.get('battlePoints') or stats.get('bp') or
-          stats.get('points') or stats.get('tokens') or '?')
-    total_w = sum(a.get('wins', 0) for a in agents)
-    total_l = sum(a.get('losses', 0) for a in agents)
+    if HEADLESS:
+        emit('account_stats', account=acc_name, battlePoints=stats.battle_points,
+             wins=sum(a.wins for a in agents), losses=sum(a.losses for a in agents))
+        return
+    if _live is not None:
+        return
+    from rich.panel import Panel
+    from rich import box
+    bp = '?' if stats.battle_points is None else stats.battle_points
+    total_w = sum(a.wins for a in agents)
+    total_l = sum(a.losses for a in agents)
     total = total_w + total_l
     wr = f'{round(total_w / total * 100)}%' if total > 0 else '-'
-    best = max(agents, key=lambda a: float(a.get('rating', 0)), default={})
+    best = max(agents, key=lambda a: a.rating, default=Agent(None))
     txt = (
         f'[bold cyan]Akun[/bold cyan]         : [white]{acc_name}[/white]\n'
         f'[bold cyan]Battle Points[/bold cyan]: [bold yellow]{bp}[/bold yellow]\n'
         f'[bold cyan]Total Battle[/bold cyan] : [white]{total}[/white]  '
         f'([green]{total_w}W[/green] / [red]{total_l}L[/red] | {wr})\n'
-        f'[bold cyan]Best Agent[/bold cyan]   : [white]{best.get("name","?")}[/white] '
-        f'| Rating [yellow]{round(float(best.get("rating",0)),1)}[/yellow]'
+        f'[bold cyan]Best Agent[/bold cyan]   : [white]{best.name}[/white] '
+        f'| Rating [yellow]{round(best.rating, 1)}[/yellow]'
     )
-    console.print(Panel(txt,
+    get_console().print(Panel(txt,
                         title='[bold]Account Stats[/bold]',
                         border_style='yellow',
                         box=box.ROUNDED,
                         padding=(1, 3)))
 
+@scoped
+@timed('render')
 def display_battle_result(battle_data, agent_name):
     if not battle_data:
         return
-    winner = battle_data.get('winner') or {}
-    winner_name = winner.get('name', '?') if isinstance(winner, dict) else str(winner)
-    opponent = (battle_data.get('opponent') or {}).get('name', '?')
-    rc = battle_data.get('ratingChange', 0)
-    old_r = battle_data.get('oldRating', 0)
-    new_r = battle_data.get('newRating', 0)
-    battle_id = battle_data.get('id', '')
-    rounds = battle_data.get('rounds', [])
-    won = winner_name == agent_name
+    if HEADLESS:
+        emit('battle_result', agent=agent_name, won=battle_data.winner == agent_name, **battle_data.to_dict())
+        return
+    if _live is not None:
+        won = battle_data.winner == agent_name
+        _live_last[agent_name] = (f'[green]W[/green] {battle_data.rating_change:+.1f}' if won
+                                  else f'[red]L[/red] {battle_data.rating_change:+.1f}')
+        return
+    from rich.text import Text
+    from rich.panel import Panel
+    from rich import box
+    opponent = battle_data.opponent
+    rc = battle_data.rating_change
+    old_r = battle_data.old_rating or 0
+    new_r = battle_data.new_rating or 0
+    battle_id = battle_data.id or ''
+    won = battle_data.winner == agent_name
     sign = '+' if rc >= 0 else ''
     wp = []
     wr_c = 0
     lc = 0
-    for rd in rounds:
-        rw = rd.get('winner') or {}
-        rn = rw.get('name', '') if isinstance(rw, dict) else str(rw)
+    for rd in battle_data.rounds:
+        rn = rd.winner
         if rn == agent_name:
             wp.append('[green][W][/green]')
             wr_c += 1
@@ -338,7 +1492,7 @@ def display_battle_result(battle_data, agent_name):
     if old_r and new_r:
         result.append(f'\n  Rating : {old_r} -> {new_r}  ({sign}{rc})',
                       style='bold green' if rc >= 0 else 'bold red')
-    console.print(Panel(result,
+    get_console().print(Panel(result,
                         title=f'Hasil Battle - {agent_name}',
                         border_style='green' if won else 'red',
                         box=box.ROUNDED,
@@ -353,13 +1507,26 @@ def display_battle_result(battle_data, agent_name):
             f'[{color}]Rating: {old_r} -> {new_r}  ({sign}{rc})[/{color}]\n'
             f'[dim]moltarena.crosstoken.io/battle/{battle_id}[/dim]'
         )
-        console.print(Panel(share,
+        get_console().print(Panel(share,
                             title='Share Card',
                             border_style='yellow',
                             box=box.ROUNDED,
                             padding=(1, 3)))
 
+@scoped
+@timed('render')
 def display_cycle_summary(cycle, results_per_agent, vote_ok, vote_fail):
+    if HEADLESS:
+        emit('cycle_summary', cycle=cycle, voted=vote_ok, voteFailed=vote_fail,
+             battles=[{'agent': name, 'ok': ok} for name, ok in results_per_agent])
+        return
+    if _live is not None:
+        ok = sum(1 for _, ok in results_per_agent if ok)
+        _live_footer['cycle'] = (f'Siklus #{cycle} {datetime.now().strftime("%H:%M:%S")} | battle {ok}/{len(results_per_agent)} OK '
+                                 f'| vote {vote_ok} OK / {vote_fail} fail')
+        return
+    from rich.table import Table
+    from rich import box
     table = Table(box=box.SIMPLE_HEAD, show_header=True, padding=(0, 2))
     table.add_column('Siklus', style='bold yellow')
     table.add_column('Agent',  style='bold cyan')
@@ -378,35 +1545,253 @@ def display_cycle_summary(cycle, results_per_agent, vote_ok, vote_fail):
         f'[green]{vote_ok} voted[/green] | [red]{vote_fail} fail[/red]',
         datetime.now().strftime('%H:%M:%S')
     )
-    console.print(table)
+    get_console().print(table)
+
+@scoped
+@timed('render')
+def display_metrics_summary(samples):
+    if not samples:
+        return
+    by_ep = {}
+    for key, seconds, outcome in samples:
+        by_ep.setdefault(key, []).append((seconds, outcome))
+    rows = []
+    for (method, ep), items in sorted(by_ep.items(), key=lambda kv: -sum(s for s, _ in kv[1])):
+        lat = [s for s, _ in items]
+        counts = {}
+        for _, o in items:
+            counts[o] = counts.get(o, 0) + 1
+        rows.append((f'{method} {ep}', len(items), pct(lat, 0.5), pct(lat, 0.95), sum(lat), counts))
+    if HEADLESS:
+        emit('metrics', endpoints=[{'endpoint': ep, 'n': n, 'p50': round(p50, 4), 'p95': round(p95, 4),
+                                    'total': round(total, 4), 'outcomes': counts}
+                                   for ep, n, p50, p95, total, counts in rows])
+        return
+    if _live is not None:
+        lat = [sec for _, sec, _ in samples]
+        _live_footer['metrics'] = f'{len(lat)} request | p50 {pct(lat, 0.5) * 1000:.0f}ms | p95 {pct(lat, 0.95) * 1000:.0f}ms'
+        return
+    from rich.table import Table
+    from rich import box
+    table = Table(title='Request per Endpoint (siklus ini)', box=box.SIMPLE_HEAD, padding=(0, 2))
+    table.add_column('Endpoint', style='cyan')
+    table.add_column('N',        justify='right')
+    table.add_column('p50 ms',   justify='right')
+    table.add_column('p95 ms',   justify='right')
+    table.add_column('Total s',  justify='right', style='yellow')
+    table.add_column('Status',   style='dim')
+    for ep, n, p50, p95, total, counts in rows:
+        status = ' '.join(f'{o}x{c}' for o, c in sorted(counts.items()))
+        table.add_row(ep, str(n), f'{p50 * 1000:.0f}', f'{p95 * 1000:.0f}', f'{total:.2f}', status)
+    get_console().print(table)
+
+NOTIF_ICONS = {
+    'battle_complete': '[BATTLE]',
+    'top100': '[TOP100]',
+    'rank_change': '[RANK]',
+    'challenge': '[CHALLENGE]',
+}
 
 def handle_notifications(accounts):
-    icons = {
-        'battle_complete': '[BATTLE]',
-        'top100': '[TOP100]',
-        'rank_change': '[RANK]',
-        'challenge': '[CHALLENGE]',
-    }
     for acc in accounts:
-        for event in check_notifications(acc):
-            etype = event.get('type', '')
-            msg = event.get('message', '')
-            log(f'[bold cyan]{icons.get(etype,"[NOTIF]")}[/bold cyan] [{acc["name"]}] {etype}: {msg}')
+        # akun yang listener-nya baru saja poll tidak perlu ditanya lagi
+        if listener(acc)['next_poll'] <= now():
+            fetch_notifications(acc)
+
+def log_notification(acc, event):
+    etype = event.get('type', '')
+    msg = event.get('message', '')
+    log(f'[bold cyan]{NOTIF_ICONS.get(etype,"[NOTIF]")}[/bold cyan] [{acc["name"]}] {etype}: {msg}')
 
 def check_notifications(acc):
-    for ep in ['/notifications/poll', '/notifications']:
-        r = retry_request(lambda ep=ep: requests.get(
-            f'{BASE_URL}{ep}',
-            headers=get_headers(acc),
-            timeout=REQUEST_TIMEOUT
-        ))
-        if r and r.status_code == 200:
-            return safe_json(r).get('data') or []
-    return []
+    # None = endpoint gagal, [] = memang tidak ada event
+    def handle(r, known):
+        if r.status_code != 200:
+            return None
+        return r.get('data') or [], 'data'
+    eps = ['/notifications/poll', '/notifications']
+    return discover(acc, 'notifications', [('GET', ep, None) for ep in eps], handle)
+
+# ===== LIVE DASHBOARD – 1 TABEL, DIGAMBAR ULANG HANYA SAAT ADA BARIS YANG BERUBAH =====
+_live = None
+_live_accounts = []
+_live_logs = deque(maxlen=LIVE_LOG_LINES)
+_live_log_counter = itertools.count(1)
+_live_log_seq = 0
+_live_last = {}
+_live_footer = {}
+# bagian yang terakhir digambar: tabel dibangun ulang hanya kalau baris berubah, panel log hanya kalau ada log/footer baru
+_live_drawn = {'rows': None, 'log': None, 'table': None, 'panel': None}
+
+def live_log(line, refresh=True):
+    # boleh dipanggil dari thread lain; repaint hanya dari main thread, sisanya menunggu live_refresh berikutnya
+    global _live_log_seq
+    _live_logs.append(line)
+    _live_log_seq = next(_live_log_counter)
+    if refresh and threading.current_thread() is threading.main_thread():
+        live_refresh()
+
+def agent_status(acc, idx, agent):
+    w = _inflight.get(battle_of(acc))
+    if w is not None and w['agent'].id == agent.id:
+        return f'[bold yellow]BATTLE[/bold yellow] {w["status"] or "pending"}'
+    until = eligible_at(agent.id)
+    if until > now():
+        # jam absolut, bukan hitung mundur, supaya baris tidak berubah tiap detik
+        return f'[dim]cooldown s/d {datetime.fromtimestamp(round(wall_clock() + until - now())).strftime("%H:%M:%S")}[/dim]'
+    return '[bold green]GILIRAN[/bold green]' if idx == acc.get('agentIndex', 0) else '[dim]standby[/dim]'
+
+def live_rows():
+    rows = []
+    for acc in _live_accounts:
+        stats = acc.get('_stats')
+        bp = '?' if stats is None or stats.battle_points is None else str(stats.battle_points)
+        for idx, a in enumerate(acc.get('_agents') or []):
+            total = a.wins + a.losses
+            wr = f'{round(a.wins / total * 100)}%' if total > 0 else '-'
+            rows.append((acc.get('name', '') if idx == 0 else '', bp if idx == 0 else '', a.name,
+                         str(round(a.rating, 1)), str(a.wins), str(a.losses), wr,
+                         agent_status(acc, idx, a), _live_last.get(a.name, '-')))
+    return rows
+
+@timed('render')
+def live_table(rows):
+    from rich.table import Table
+    from rich import box
+    table = Table(title=f'MoltArena -- {len(_live_accounts)} akun | interval {BATTLE_INTERVAL}s | {STRATEGY}',
+                  box=box.ROUNDED, border_style='cyan', padding=(0, 1))
+    table.add_column('Akun',     style='bold cyan')
+    table.add_column('BP',       style='yellow', justify='right')
+    table.add_column('Agent',    style='bold white', min_width=14)
+    table.add_column('Rating',   style='yellow', justify='right')
+    table.add_column('W',        style='green',  justify='right')
+    table.add_column('L',        style='red',    justify='right')
+    table.add_column('WR%',      style='magenta', justify='right')
+    table.add_column('Status')
+    table.add_column('Terakhir', justify='right')
+    for row in rows:
+        table.add_row(*row)
+    return table
+
+@timed('render')
+def live_panel():
+    from rich.panel import Panel
+    from rich import box
+    footer = ' || '.join(_live_footer[k] for k in ('cycle', 'vote', 'metrics') if k in _live_footer)
+    return Panel('\n'.join(list(_live_logs)) or '[dim]-[/dim]', title='Log', border_style='dim',
+                 box=box.ROUNDED, subtitle=footer or None)
+
+def live_refresh(force=False):
+    if _live is None:
+        return
+    from rich.console import Group
+    rows = live_rows()
+    log_state = (_live_log_seq, sorted(_live_footer.items()))
+    table_dirty = force or rows != _live_drawn['rows']
+    panel_dirty = force or log_state != _live_drawn['log']
+    if not table_dirty and not panel_dirty:
+        return
+    if table_dirty:
+        _live_drawn.update(rows=rows, table=live_table(rows))
+    if panel_dirty:
+        _live_drawn.update(log=log_state, panel=live_panel())
+    _live.update(Group(_live_drawn['table'], _live_drawn['panel']), refresh=True)
+
+def start_live(accounts):
+    global _live, _live_accounts
+    from rich.live import Live
+    _live_accounts = accounts
+    _live = Live(console=get_console(), auto_refresh=False, redirect_stdout=False, redirect_stderr=False)
+    _live.start()
+    live_refresh(force=True)
+
+def stop_live():
+    global _live
+    if _live is not None:
+        live_refresh(force=True)
+        _live.stop()
+        _live = None
+
+# ===== PROFILE PER SIKLUS – cProfile KE FILE .pstats + RINCIAN WAKTU PER FUNGSI =====
+PROFILE_KINDS = ('network', 'sleep', 'json', 'render')
+_profiler = None
+_profile_mark = ({}, 0.0)
+
+def start_profile():
+    global _profiler, _profile_mark
+    import cProfile
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with _perf_lock:
+        _profile_mark = (dict(perf_scopes), time.perf_counter())
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+    if profile_cycle not in cycle_hooks:
+        cycle_hooks.append(profile_cycle)
+
+def stop_profile():
+    global _profiler
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler = None
+
+def profile_cycle(cycle):
+    if _profiler is None:
+        return
+    _profiler.disable()
+    path = os.path.join(PROFILE_DIR, f'cycle-{cycle:04d}.pstats')
+    _profiler.dump_stats(path)
+    mark, t0 = _profile_mark
+    by_fn = {}
+    with _perf_lock:
+        scopes = dict(perf_scopes)
+    for (fn, kind), total in scopes.items():
+        dt = total - mark.get((fn, kind), 0.0)
+        if dt > 1e-6:
+            by_fn.setdefault(fn, dict.fromkeys(PROFILE_KINDS, 0.0))[kind] = dt
+    display_profile(cycle, path, time.perf_counter() - t0, by_fn)
+    start_profile()
+
+@timed('render')
+def display_profile(cycle, path, wall, by_fn):
+    rows = sorted(by_fn.items(), key=lambda kv: -sum(kv[1].values()))
+    if HEADLESS:
+        emit('profile', cycle=cycle, file=path, wall=round(wall, 4),
+             functions={fn: {k: round(v, 4) for k, v in kinds.items()} for fn, kinds in rows})
+        return
+    accounted = sum(sum(k.values()) for k in by_fn.values())
+    if _live is not None:
+        # ringkas untuk panel log: total per jenis + 3 fungsi teratas
+        totals = ' | '.join(f'{k} {sum(kinds[k] for kinds in by_fn.values()) * 1000:.0f}' for k in PROFILE_KINDS)
+        top = ', '.join(f'{fn} {sum(kinds.values()) * 1000:.0f}' for fn, kinds in rows[:3])
+        log_info(f'Profile siklus #{cycle} ({wall:.2f}s, ms): {totals} | lain {max(wall - accounted, 0) * 1000:.0f} -> {path}')
+        if top:
+            live_log(f'  [dim]teratas: {top}[/dim]')
+        return
+    from rich.table import Table
+    from rich import box
+    table = Table(title=f'Profile Siklus #{cycle} -- {wall:.2f}s wall (ms)', caption=path,
+                  box=box.SIMPLE_HEAD, padding=(0, 2))
+    table.add_column('Fungsi', style='cyan', no_wrap=True)
+    for kind in PROFILE_KINDS:
+        table.add_column(kind, justify='right', min_width=7)
+    table.add_column('total', justify='right', style='yellow')
+    for fn, kinds in rows:
+        table.add_row(fn, *(f'{kinds[k] * 1000:.1f}' for k in PROFILE_KINDS), f'{sum(kinds.values()) * 1000:.1f}')
+    table.add_row('[dim]lain-lain (CPU)[/dim]', *('' for _ in PROFILE_KINDS), f'{max(wall - accounted, 0) * 1000:.1f}')
+    get_console().print(table)
 
 # ===== MAIN LOOP =====
+@timed('render')
 def print_banner(accounts):
-    console.print(Panel(
+    if HEADLESS:
+        emit('start', accounts=len(accounts), interval=BATTLE_INTERVAL, rounds=ROUNDS,
+             strategy=STRATEGY, maxVote=MAX_VOTE_PER_CYCLE)
+        return
+    if LIVE:
+        return  # judul tabel dashboard sudah memuat konfigurasi
+    from rich.panel import Panel
+    from rich import box
+    get_console().print(Panel(
         f'[bold cyan]Akun[/bold cyan]    : [white]{len(accounts)}[/white]\n'
         f'[bold cyan]Interval[/bold cyan]: [white]{BATTLE_INTERVAL}s[/white]  [bold cyan]Ronde[/bold cyan]: [white]{ROUNDS}[/white]\n'
         f'[bold cyan]Strategy[/bold cyan]: [white]{STRATEGY}[/white]  [bold cyan]MaxVote[/bold cyan]: [white]{MAX_VOTE_PER_CYCLE}[/white]',
@@ -416,116 +1801,368 @@ def print_banner(accounts):
         padding=(1, 4)
     ))
 
+# ===== BATTLE WATCHER – SEMUA BATTLE IN-FLIGHT, POLLING ADAPTIF =====
+DONE_STATUSES = ('finished', 'completed', 'done', 'ended', 'voting')
+FAILED_STATUSES = ('cancelled', 'error', 'failed')
+
+_inflight = {}
+_finished = []
+_durations = []
+
+def expected_duration():
+    recent = _durations[-20:]
+    return sum(recent) / len(recent) if recent else None
+
+def watch_battle(acc, agent, battle_id, on_done, started_at=None):
+    t = now()
+    est = expected_duration()
+    first = FALLBACK_POLL if listening(acc) else max(POLL_INTERVAL, est * 0.8 if est else 0)
+    listener(acc)['interval'] = NOTIFY_INTERVAL
+    if started_at is None:
+        started_at = wall_clock()
+        # battleId ikut di-journal supaya battle yang sedang jalan bisa disambung lagi setelah restart
+        persist(acc, battleId=battle_id, battleAgentId=agent.id, battleStartedAt=round(started_at, 1))
+    _inflight[battle_id] = {
+        'acc': acc, 'agent': agent, 'on_done': on_done,
+        'started': t - max(wall_clock() - started_at, 0), 'status': '', 'interval': POLL_INTERVAL,
+        'next_poll': t + first, 'expected': t + (est * 0.8 if est else 0),
+    }
+
+def battle_of(acc):
+    for battle_id, w in _inflight.items():
+        if w['acc'] is acc:
+            return battle_id
+    return None
+
+def next_poll_at():
+    deadlines = [w['next_poll'] for w in _inflight.values()]
+    deadlines += [listener_due(acc) for acc in inflight_accounts()]
+    return min(deadlines, default=None)
+
+def finish_battle(battle_id, ok, bd):
+    w = _inflight.pop(battle_id)
+    persist(w['acc'], battleId=None, battleAgentId=None, battleStartedAt=None)
+    if ok:
+        _durations.append(now() - w['started'])
+    w['on_done'](w['acc'], w['agent'], ok, bd, now() - w['started'])
+    _finished.append((w['acc'], w['agent'], ok))
+
+def drain_finished():
+    done = list(_finished)
+    _finished.clear()
+    return done
+
+@scoped
+def poll_battles():
+    poll_listeners()
+    for battle_id, w in list(_inflight.items()):
+        t = now()
+        if w['next_poll'] > t:
+            continue
+        update_battle(battle_id, w, get_battle_status(battle_id, w['acc']))
+
+def update_battle(battle_id, w, bd):
+    status = bd.status if bd else ''
+    elapsed = now() - w['started']
+    if status in DONE_STATUSES:
+        finish_battle(battle_id, True, bd)
+    elif status in FAILED_STATUSES:
+        log_err(f'Battle {status}: {w["agent"].name}')
+        finish_battle(battle_id, False, bd)
+    elif elapsed >= MAX_WAIT_BATTLE:
+        log_warn(f'Timeout {w["agent"].name}')
+        finish_battle(battle_id, False, None)
+    else:
+        # status berubah -> poll lagi dengan interval dasar; status sama -> backoff,
+        # tapi jangan lewati perkiraan selesai dari durasi battle sebelumnya
+        if status != w['status']:
+            w['status'] = status
+            w['interval'] = POLL_INTERVAL
+        else:
+            w['interval'] = min(w['interval'] * 1.5, POLL_MAX)
+        interval = w['interval']
+        est = expected_duration()
+        if est and elapsed < est:
+            interval = min(interval, max(est - elapsed, POLL_MIN))
+        if listening(w['acc']):
+            # notifikasi battle_complete yang membangunkan; poll status cuma cadangan
+            interval = max(interval, FALLBACK_POLL)
+        w['next_poll'] = now() + interval
+
+# ===== NOTIFICATION LISTENER – 1 POLL PER AKUN, battle_complete MEMBANGUNKAN WATCHER =====
+_listeners = {}
+
+def listener(acc):
+    return _listeners.setdefault(acc['apiKey'], {'ok': False, 'next_poll': now(), 'interval': NOTIFY_INTERVAL})
+
+def listening(acc):
+    return listener(acc)['ok']
+
+def listener_due(acc):
+    # jangan tanya notifikasi sebelum battle akun ini kira-kira selesai
+    expected = min(w['expected'] for w in _inflight.values() if w['acc'] is acc)
+    return max(listener(acc)['next_poll'], expected)
+
+def inflight_accounts():
+    return list({id(w['acc']): w['acc'] for w in _inflight.values()}.values())
+
+@scoped
+def fetch_notifications(acc):
+    events = check_notifications(acc)
+    state = listener(acc)
+    state['ok'] = events is not None
+    # sepi -> backoff seperti poll status; ada event -> kembali ke interval dasar
+    state['interval'] = NOTIFY_INTERVAL if events else min(state['interval'] * 1.5, POLL_MAX)
+    state['next_poll'] = now() + state['interval']
+    for event in events or []:
+        log_notification(acc, event)
+        if event.get('type') == 'battle_complete':
+            w = _inflight.get(event.get('battleId') or battle_of(acc))
+            if w is not None and w['acc'] is acc:
+                w['next_poll'] = now()
+
+def poll_listeners():
+    for acc in inflight_accounts():
+        if listener_due(acc) <= now():
+            fetch_notifications(acc)
+
+@scoped
+def idle(seconds, until_event=False):
+    # tidur tanpa menahan watcher: battle yang jatuh tempo tetap di-poll di sela-sela
+    end = now() + seconds
+    while True:
+        poll_battles()
+        live_refresh()
+        t = now()
+        if t >= end or (until_event and _finished):
+            return
+        nxt = next_poll_at()
+        sleep(max(min(end, nxt if nxt is not None else end) - t, 0))
+
+_history = None
+
+@scoped
+def record_history(acc, agent, bd):
+    global _history
+    try:
+        if _history is None:
+            _history = battle_history.connect(HISTORY_FILE)
+        # simpan payload asli supaya kolom raw tetap lengkap untuk analisis offline
+        battle_history.record_battle(_history, bd.raw or bd.to_dict(), acc.get('name'), agent.id, agent.name)
+    except sqlite3.Error as e:
+        log_warn(f'Gagal simpan riwayat battle: {e}')
+
+@scoped
+def on_battle_done(acc, agent, ok, bd, waited):
+    if not ok:
+        if bd is None:
+            mark_stale(agent.id)
+        return
+    apply_battle_result(agent.id, bd)
+    record_history(acc, agent, bd)
+    log_ok(f'Battle selesai! {agent.name} ({waited:.0f}s)')
+    display_battle_result(bd, agent.name)
+
+@scoped
+def reattach_battle(acc):
+    # battle yang masih jalan saat bot mati: cek statusnya dulu sebelum akun boleh dijadwal lagi
+    battle_id = acc.get('battleId')
+    if not battle_id:
+        return
+    agent = next((a for a in acc.get('_agents', []) if a.id == acc.get('battleAgentId')), None)
+    if agent is None:
+        log_warn(f'Battle {str(battle_id)[:12]}... milik agent yang tidak dikenal, dilepas')
+        persist(acc, battleId=None, battleAgentId=None, battleStartedAt=None)
+        return
+    log_info(f'Sambung lagi battle {str(battle_id)[:12]}... ({agent.name})')
+    watch_battle(acc, agent, battle_id, on_battle_done, acc.get('battleStartedAt') or wall_clock())
+    update_battle(battle_id, _inflight[battle_id], get_battle_status(battle_id, acc))
+
+@scoped
 def run_battle_for_agent(acc, agent):
-    agent_name = agent.get('name', '?')
-    agent_id = agent.get('id')
-    log_info(f'Battle: [bold]{agent_name}[/bold] | Rating: {round(float(agent.get("rating", 0)), 1)}')
+    agent_name = agent.name
+    agent_id = agent.id
+    log_info(f'Battle: [bold]{agent_name}[/bold] | Rating: {round(agent.rating, 1)}')
     battle_id = start_battle(acc, agent_id)
     if not battle_id:
         log_err(f'Gagal mulai battle {agent_name}')
         return False
     log_ok(f'Battle dimulai! ID: {str(battle_id)[:12]}...')
-    with Progress(
-        SpinnerColumn(),
-        TextColumn('{task.description}'),
-        TimeElapsedColumn(),
-        console=console,
-        transient=True
-    ) as progress:
-        task = progress.add_task(f'[cyan]Menunggu {agent_name}...', total=None)
-        waited = 0
-        while waited < MAX_WAIT_BATTLE:
-            time.sleep(POLL_INTERVAL)
-            waited += POLL_INTERVAL
-            bd = get_battle_status(battle_id, acc)
-            status = str(bd.get('status', '')).lower()
-            progress.update(task, description=f'[cyan]{agent_name} | {status or "running"} ({waited}s)')
-            if status in ('finished', 'completed', 'done', 'ended', 'voting'):
-                log_ok(f'Battle selesai! ({waited}s)')
-                display_battle_result(bd, agent_name)
-                return True
-            if status in ('cancelled', 'error', 'failed'):
-                log_err(f'Battle {status}: {agent_name}')
-                return False
-    log_warn(f'Timeout {agent_name}')
-    return False
-
-def main():
+    watch_battle(acc, agent, battle_id, on_battle_done)
+    return True
+
+def shutdown():
+    stop_live()
+    stop_profile()
+    close_sessions()
+    save_accounts()
+
+def main(max_cycles=None):
+    if REPLAY_FILE:
+        prepare_replay()
     accounts = load_accounts()
+    if RECORD_FILE:
+        start_recording(accounts)
     print_banner(accounts)
+    if LIVE and not HEADLESS:
+        start_live(accounts)
     valid = []
-    console.rule('[cyan]Validasi Akun & Load Agents[/cyan]')
+    warm = []
+    rule('[cyan]Validasi Akun & Load Agents[/cyan]')
     for acc in accounts:
-        agents = get_my_agents(acc)
-        if not agents:
-            log_err(f'{acc.get("name")} -- tidak ada agent dari myAgentIds.')
-            continue
+        snap = load_snapshot(acc)
+        if snap:
+            agents, stats, age = snap
+            warm.append(acc)
+        else:
+            agents = get_my_agents(acc)
+            if not agents:
+                log_err(f'{acc.get("name")} -- tidak ada agent dari myAgentIds.')
+                continue
+            stats = get_account_stats(acc)
         acc['_agents'] = agents
-        stats = get_account_stats(acc)
         acc['_stats'] = stats
-        log_ok(f'{acc.get("name")} -- {len(agents)} agent dimuat')
+        restore_cooldowns(acc)
+        reattach_battle(acc)
+        if snap:
+            log_ok(f'{acc.get("name")} -- {len(agents)} agent dari snapshot ({age / 60:.0f} menit), revalidasi di background')
+        else:
+            log_ok(f'{acc.get("name")} -- {len(agents)} agent dimuat')
         display_account_stats(acc.get('name'), stats, agents)
-        display_agents_table(agents, acc.get('agentIndex', 0))
+        display_agents_table(agents, acc.get('agentIndex', 0), acc.get('name'))
         valid.append(acc)
 
     if not valid:
         log_err('Tidak ada akun valid.')
+        stop_live()
         sys.exit(1)
 
     log_ok(f'{len(valid)} akun siap.')
+    if len(warm) < len(valid):
+        save_snapshot(valid)
+    if warm:
+        revalidate(warm)
+    if PROFILE_DIR:
+        start_profile()
     cycle = 0
     while True:
         try:
+            if replay_exhausted():
+                log_info(f'Cassette selesai di-replay ({_cassette.misses} request tidak ada di rekaman).')
+                shutdown()
+                return
+            apply_revalidated(valid)
+            poll_battles()
+            free = [acc for acc in valid if battle_of(acc) is None]
+            due = due_accounts(free)
+            if not due and not _finished:
+                waits = [seconds_until_next(free)] if free else []
+                nxt = next_poll_at()
+                if nxt is not None:
+                    waits.append(max(nxt - now(), 0))
+                if next_revalidate_at() is not None:
+                    waits.append(max(next_revalidate_at() - now(), 0))
+                wait = min(waits) if waits else BATTLE_INTERVAL
+                if revalidating() or _revalidated:
+                    wait = min(wait, POLL_MIN)
+                if nxt is None:
+                    log_info(f'Tunggu {wait:.0f}s sampai cooldown agent berikutnya habis...')
+                idle(wait, until_event=True)
+                continue
             cycle += 1
-            console.rule(f'[bold yellow]SIKLUS #{cycle} -- {datetime.now().strftime("%H:%M:%S")}[/bold yellow]')
+            if HEADLESS:
+                emit('cycle_start', cycle=cycle)
+            rule(f'[bold yellow]SIKLUS #{cycle} -- {datetime.now().strftime("%H:%M:%S")}[/bold yellow]')
             handle_notifications(valid)
             results_summary = []
             total_voted = 0
             total_vfail = 0
 
-            for acc in valid:
+            for acc in due:
                 agents = acc.get('_agents', [])
-                if not agents:
-                    continue
-                idx = acc.get('agentIndex', 0) % len(agents)
-                agent = agents[idx]
-                console.print(
-                    f'\n[bold white][ >> {acc["name"]} | Battle {idx+1}/{len(agents)}: {agent.get("name")} ][/bold white]'
-                )
-                ok = run_battle_for_agent(acc, agent)
-                results_summary.append((agent.get('name', '?'), ok))
-                acc['agentIndex'] = (idx + 1) % len(agents)
-                save_accounts([{k: v for k, v in a.items() if not k.startswith("_")} for a in valid])
+                idx, agent = next_agent(acc)
+                if HEADLESS:
+                    emit('battle_turn', account=acc['name'], agent=agent.name, index=idx + 1, total=len(agents))
+                elif not LIVE:
+                    get_console().print(
+                        f'\n[bold white][ >> {acc["name"]} | Battle {idx+1}/{len(agents)}: {agent.name} ][/bold white]'
+                    )
+                started = run_battle_for_agent(acc, agent)
+                if not started:
+                    if eligible_at(agent.id) <= now():
+                        cool_down_account(acc, FAILED_BATTLE_DELAY)
+                    results_summary.append((agent.name, False))
+                persist(acc, agentIndex=(idx + 1) % len(agents))
 
                 v_ok, v_fail = run_auto_vote(acc)
                 total_voted += v_ok
                 total_vfail += v_fail
 
-                if acc != valid[-1]:
+                if acc is not due[-1]:
                     d = random.uniform(*ACCOUNT_DELAY)
                     log_info(f'Jeda {d:.1f}s...')
-                    time.sleep(d)
+                    idle(d)
 
+            finished = drain_finished()
+            results_summary += [(agent.name, ok) for _, agent, ok in finished]
             display_cycle_summary(cycle, results_summary, total_voted, total_vfail)
+            display_metrics_summary(drain_cycle_samples())
+            export_metrics()
+            if cond_stats['sent']:
+                log_info(f'Conditional GET: {cond_stats["hits"]}/{cond_stats["sent"]} dilayani 304 (cache)')
+            if any(retry_stats.values()):
+                log_info(f'Retry: {retry_stats["retries"]} | budget habis: {retry_stats["budget_denied"]} '
+                         f'| ditolak circuit: {retry_stats["short_circuit"]}')
 
-            for acc in valid:
-                acc['_agents'] = get_my_agents(acc)
-                acc['_stats'] = get_account_stats(acc)
+            refresh = {id(acc): acc for acc, _, _ in finished}
+            for acc in refresh.values():
+                acc['_agents'] = get_my_agents(acc, max_age=AGENT_TTL)
+                acc['_stats'] = get_account_stats(acc, max_age=STATS_TTL)
                 if acc['_agents']:
                     display_account_stats(acc.get('name'), acc['_stats'], acc['_agents'])
-                    display_agents_table(acc['_agents'], acc.get('agentIndex', 0))
+                    display_agents_table(acc['_agents'], acc.get('agentIndex', 0), acc.get('name'))
+            if refresh:
+                save_snapshot(valid)
 
-            log_info(f'Tunggu {BATTLE_INTERVAL}s sebelum siklus berikutnya...')
-            time.sleep(BATTLE_INTERVAL)
+            for hook in cycle_hooks:
+                hook(cycle)
+            live_refresh()
+            if max_cycles and cycle >= max_cycles:
+                shutdown()
+                return
 
         except KeyboardInterrupt:
             log_warn('Bot dihentikan.')
-            save_accounts([{k: v for k, v in a.items() if not k.startswith("_")} for a in valid])
+            shutdown()
             sys.exit(0)
         except Exception as e:
             log_err(f'ERROR: {type(e).__name__}: {e}')
             log_warn('Retry dalam 30s...')
-            time.sleep(30)
+            sleep(30)
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description='MoltArena auto battle + vote bot.')
+    p.add_argument('--headless', action='store_true',
+                   help='output event JSONL ke stdout tanpa rich (juga via MOLTARENA_HEADLESS=1)')
+    p.add_argument('--live', action='store_true',
+                   help='dashboard live: 1 tabel yang diperbarui di tempat, bukan panel per siklus')
+    p.add_argument('--record', metavar='FILE', help='rekam semua request/respons ke cassette JSONL (auth di-redact), misal cassettes/run.jsonl')
+    p.add_argument('--replay', metavar='FILE', help='putar ulang cassette tanpa jaringan')
+    p.add_argument('--replay-speed', type=float, default=0,
+                   help='kecepatan replay: 1 = real time, 10 = 10x, 0 = tanpa jeda (default)')
+    p.add_argument('--cycles', type=int, help='berhenti setelah N siklus')
+    p.add_argument('--profile', metavar='DIR', nargs='?', const='profiles',
+                   help='cProfile tiap siklus ke DIR/cycle-NNNN.pstats + rincian network/sleep/json/render per fungsi')
+    return p.parse_args(argv)
 
 if __name__ == '__main__':
-    main()
+    args = parse_args()
+    if args.headless:
+        HEADLESS = True
+    LIVE = args.live
+    RECORD_FILE = args.record
+    if args.replay:
+        REPLAY_FILE = args.replay
+        CLOCK_SPEED = args.replay_speed
+    PROFILE_DIR = args.profile
+    main(max_cycles=args.cycles)
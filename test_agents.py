@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import moltarena_bot as bot
+
+
+@pytest.fixture
+def acc(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, 'ENDPOINTS_FILE', str(tmp_path / 'endpoints.json'))
+    monkeypatch.setattr(bot, 'HEADLESS', True)
+    monkeypatch.setattr(bot, '_endpoints', None)
+    monkeypatch.setattr(bot, '_next_eligible', {})
+    expired = bot.now() - bot.AGENT_TTL - 1
+    monkeypatch.setattr(bot, '_agent_cache', {
+        aid: {'agent': bot.Agent(aid, f'old-{aid}'), 'fetched': expired, 'stale': False} for aid in ('x', 'y')})
+    return {'name': 'a1', 'apiKey': 'key-a1', 'myAgentIds': ['x', 'y'], 'agentIndex': 0}
+
+
+def test_failed_refetch_keeps_cached_agents(acc, monkeypatch):
+    monkeypatch.setattr(bot, 'api_request', lambda *a, **kw: None)
+    acc['_agents'] = bot.get_my_agents(acc, max_age=bot.AGENT_TTL)
+    assert [a.name for a in acc['_agents']] == ['old-x', 'old-y']
+    assert bot.due_accounts([acc]) == [acc]
+    assert not bot.cache_fresh(bot._agent_cache['x'], bot.AGENT_TTL)
+
+
+def test_only_404_agents_are_dropped(acc, monkeypatch):
+    def api_request(acc, method, path, payload=None):
+        return bot.ApiResponse(404, {'error': 'not found'}, path=path) if path == '/agents/x' else None
+    monkeypatch.setattr(bot, 'api_request', api_request)
+    assert [a.name for a in bot.get_my_agents(acc, max_age=bot.AGENT_TTL)] == ['old-y']
+
+
+@pytest.mark.parametrize('status, unsupported', [(429, False), (401, False), (503, False), (404, True), (405, True)])
+def test_bulk_marked_unsupported_only_for_missing_routes(acc, monkeypatch, status, unsupported):
+    monkeypatch.setattr(bot, 'api_request', lambda acc, method, path, payload=None: bot.ApiResponse(status, {}, path=path))
+    assert bot.get_agents_bulk(acc, ['x', 'y']) is None
+    assert ('unsupported' in bot.load_endpoints().get('agents_bulk', {})) is unsupported
+
+
+def test_bulk_marked_unsupported_when_every_200_is_rejected(acc, monkeypatch):
+    listing = {'agents': [{'id': 'someone-else'}]}
+    monkeypatch.setattr(bot, 'api_request', lambda acc, method, path, payload=None: bot.ApiResponse(200, listing, path=path))
+    assert bot.get_agents_bulk(acc, ['x', 'y']) is None
+    assert 'unsupported' in bot.load_endpoints()['agents_bulk']
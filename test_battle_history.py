@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import battle_history
+
+
+def battle(**extra):
+    return dict({'id': 'b1', 'status': 'finished', 'winner': {'name': 'me'}, 'opponent': {'name': 'rival'},
+                 'oldRating': 1000, 'newRating': 1010, 'ratingChange': 10,
+                 'rounds': [{'winner': {'name': 'me'}}, {'winner': None}]}, **extra)
+
+
+def test_finished_at_comes_from_payload(tmp_path):
+    db = battle_history.connect(str(tmp_path / 'battles.db'))
+    battle_history.record_battle(db, battle(finishedAt='2026-01-02T03:04:05Z'), 'acc', 'a1', 'me')
+    battle_history.record_battle(db, dict(battle(finishedAt=1767225600000), id='b2'), 'acc', 'a1', 'me')
+    rows = dict(db.execute('SELECT id, finished_at FROM battles'))
+    assert rows == {'b1': 1767323045.0, 'b2': 1767225600.0}
+    assert [t for t, *_ in battle_history.rating_trend(db, 'a1')] == [1767225600.0, 1767323045.0]
+
+
+def test_raw_payload_and_rounds_are_kept(tmp_path):
+    db = battle_history.connect(str(tmp_path / 'battles.db'))
+    battle_history.record_battle(db, battle(extra={'k': 1}), 'acc', 'a1', 'me', finished_at=5)
+    raw, at = db.execute('SELECT raw, finished_at FROM battles').fetchone()
+    assert '"extra": {"k": 1}' in raw and at == 5
+    assert db.execute('SELECT idx, result FROM rounds ORDER BY idx').fetchall() == [(0, 'W'), (1, 'D')]
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+import moltarena_bot as bot
+
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    accounts = tmp_path / 'accounts.json'
+    accounts.write_text(json.dumps([{'name': 'a1', 'apiKey': 'key-a1', 'myAgentIds': ['x']}]))
+    monkeypatch.setattr(bot, 'ACCOUNTS_FILE', str(accounts))
+    monkeypatch.setattr(bot, 'JOURNAL_FILE', str(accounts) + '.journal')
+    monkeypatch.setattr(bot, 'HEADLESS', True)
+    monkeypatch.setattr(bot, '_journal_len', 0)
+    return tmp_path
+
+
+def torn_write(path):
+    with open(path, 'a') as f:
+        f.write('{"account": "a1", "agentIn')
+
+
+def test_persist_survives_restart(state):
+    acc = bot.load_accounts()[0]
+    bot.persist(acc, agentIndex=1, battleId='B0')
+    acc = bot.load_accounts()[0]
+    assert (acc['agentIndex'], acc['battleId']) == (1, 'B0')
+
+
+def test_torn_write_does_not_swallow_later_entries(state):
+    acc = bot.load_accounts()[0]
+    bot.persist(acc, agentIndex=1)
+    torn_write(bot.JOURNAL_FILE)
+    acc = bot.load_accounts()[0]
+    assert acc['agentIndex'] == 1
+    bot.persist(acc, agentIndex=5, battleId='B1')
+    acc = bot.load_accounts()[0]
+    assert (acc['agentIndex'], acc['battleId']) == (5, 'B1')
+
+
+def test_bad_line_in_the_middle_is_skipped(state):
+    with open(bot.JOURNAL_FILE, 'w') as f:
+        f.write(json.dumps({'account': 'a1', 'agentIndex': 2}) + '\n')
+        f.write('{"account": "a1", "agentIn' + json.dumps({'account': 'a1', 'battleId': 'lost'}) + '\n')
+        f.write(json.dumps({'account': 'a1', 'battleId': 'B2'}) + '\n')
+    acc = bot.load_accounts()[0]
+    assert (acc['agentIndex'], acc['battleId']) == (2, 'B2')
+    assert not (state / 'accounts.json.journal').exists()
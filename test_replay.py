@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import moltarena_bot as bot
+
+
+def test_parallel_waits_overlap_on_the_virtual_clock(monkeypatch):
+    monkeypatch.setattr(bot, 'CLOCK_SPEED', 0)
+    monkeypatch.setattr(bot, '_clock_offset', 0.0)
+    start = bot.now()
+    def request(_):
+        with bot.clock_from(start):
+            bot.pass_time(0.5)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(request, range(4)))
+    assert 0.5 <= bot.now() - start < 0.6
+    bot.pass_time(1.0)
+    assert 1.5 <= bot.now() - start < 1.6
+
+
+def test_clock_updates_are_not_lost(monkeypatch):
+    monkeypatch.setattr(bot, 'CLOCK_SPEED', 0)
+    monkeypatch.setattr(bot, '_clock_offset', 0.0)
+    start = bot.now()
+    def run(i):
+        with bot.clock_from(start):
+            for _ in range(200):
+                bot.pass_time(0.01 * (i + 1))
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert 8.0 <= bot.now() - start < 8.1
+
+
+def test_cassette_header_holds_no_credentials(tmp_path, monkeypatch):
+    record = tmp_path / 'cassettes' / 'run.jsonl'
+    monkeypatch.setattr(bot, 'RECORD_FILE', str(record))
+    monkeypatch.setattr(bot, 'SNAPSHOT_FILE', str(tmp_path / 'snapshot.json'))
+    monkeypatch.setattr(bot, 'ENDPOINTS_FILE', str(tmp_path / 'endpoints.json'))
+    monkeypatch.setattr(bot, '_endpoints', None)
+    monkeypatch.setattr(bot, '_recorder', None)
+    acc = {'name': 'a1', 'apiKey': 'key-a1', 'token': 'tok-a1', 'myAgentIds': ['x'], '_agents': []}
+    bot.start_recording([acc])
+    bot._recorder.close()
+    header = record.read_text()
+    assert 'key-a1' not in header and 'tok-a1' not in header
+    assert json.loads(header)['state']['accounts'][bot.account_hash('key-a1')] == {'name': 'a1', 'myAgentIds': ['x']}
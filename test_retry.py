@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+import moltarena_bot as bot
+
+
+class Resp:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def timeout():
+    return requests.exceptions.ReadTimeout('read timed out')
+
+def reset():
+    return requests.exceptions.ConnectionError('Connection reset by peer')
+
+def connect():
+    return requests.exceptions.ConnectionError(MaxRetryError(None, '/x', NewConnectionError(None, 'refused')))
+
+
+def stub(*outcomes):
+    # hasil berurutan per panggilan, outcome terakhir diulang; exception di-raise, angka jadi status
+    calls = []
+    def func():
+        out = outcomes[min(len(calls), len(outcomes) - 1)]
+        calls.append(out)
+        if callable(out):
+            raise out()
+        return Resp(out)
+    return func, calls
+
+
+@pytest.fixture(autouse=True)
+def state(monkeypatch):
+    monkeypatch.setattr(bot, 'HEADLESS', True)
+    monkeypatch.setattr(bot, 'RETRY_BACKOFF', 0)
+    monkeypatch.setattr(bot, '_breakers', {})
+    monkeypatch.setattr(bot, '_retry_tokens', [float(bot.RETRY_BUDGET_MAX)])
+    monkeypatch.setattr(bot, 'retry_stats', {'retries': 0, 'budget_denied': 0, 'short_circuit': 0})
+    monkeypatch.setattr(bot, '_clock_offset', 0.0)
+
+
+@pytest.mark.parametrize('failure', [timeout, reset, 503])
+def test_deploy_is_never_resent_after_it_may_have_reached_the_server(failure):
+    func, calls = stub(failure, 201)
+    r = bot.retry_request(func, 'POST', '/deploy/battle')
+    assert len(calls) == 1
+    assert (r.status_code if r is not None else None) == (503 if failure == 503 else None)
+
+
+@pytest.mark.parametrize('failure', [timeout, reset, 503])
+def test_get_is_retried_after_timeout_reset_and_5xx(failure):
+    func, calls = stub(failure, 200)
+    assert bot.retry_request(func, 'GET', '/agents/x').status_code == 200
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize('method, path', [('POST', '/deploy/battle'), ('GET', '/agents/x')])
+def test_connect_failures_are_retried_for_every_method(method, path):
+    func, calls = stub(connect, connect, 201)
+    assert bot.retry_request(func, method, path).status_code == 201
+    assert len(calls) == 3
+
+
+def test_breaker_opens_at_threshold_and_lets_one_half_open_probe_through(monkeypatch):
+    func, calls = stub(503)
+    for _ in range(bot.BREAKER_THRESHOLD):
+        bot.retry_request(func, 'POST', '/deploy/battle')
+    assert len(calls) == bot.BREAKER_THRESHOLD
+    assert bot.retry_request(func, 'POST', '/deploy/battle') is None
+    assert len(calls) == bot.BREAKER_THRESHOLD and bot.retry_stats['short_circuit'] == 1
+
+    monkeypatch.setattr(bot, '_clock_offset', bot.BREAKER_COOLDOWN + 1.0)
+    blocked, calls_during_probe = [], []
+    def probe():
+        # request lain selama probe half-open masih ditolak
+        other, other_calls = stub(201)
+        blocked.append(bot.retry_request(other, 'POST', '/deploy/battle'))
+        calls_during_probe.extend(other_calls)
+        return Resp(201)
+    assert bot.retry_request(probe, 'POST', '/deploy/battle').status_code == 201
+    assert blocked == [None] and calls_during_probe == []
+
+    func, calls = stub(201)
+    assert bot.retry_request(func, 'POST', '/deploy/battle').status_code == 201
+    assert len(calls) == 1
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import moltarena_bot as bot
+
+
+@pytest.fixture
+def acc(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, 'SNAPSHOT_FILE', str(tmp_path / 'snapshot.json'))
+    monkeypatch.setattr(bot, 'HEADLESS', True)
+    monkeypatch.setattr(bot, '_agent_cache', {})
+    monkeypatch.setattr(bot, '_stats_cache', {})
+    monkeypatch.setattr(bot, '_revalidated', bot.deque())
+    monkeypatch.setattr(bot, '_revalidate_retry', [])
+    monkeypatch.setattr(bot, '_revalidate_at', None)
+    monkeypatch.setattr(bot, 'revalidate', lambda accounts: None)
+    return {'name': 'a1', 'apiKey': 'key-a1', 'myAgentIds': ['x', 'y'],
+            '_agents': [bot.Agent('x', 'old-x'), bot.Agent('y', 'old-y')], '_stats': bot.Stats()}
+
+
+def test_fresh_data_replaces_snapshot_on_main_thread(acc):
+    valid = [acc]
+    bot._revalidated.append((acc, {'x': bot.Agent('x', 'new-x'), 'y': bot.Agent('y', 'new-y')}, set(), bot.Stats()))
+    bot.apply_revalidated(valid)
+    assert [a.name for a in acc['_agents']] == ['new-x', 'new-y']
+    assert bot._agent_cache['x']['agent'].name == 'new-x' and 'key-a1' in bot._stats_cache
+    assert valid == [acc] and bot.next_revalidate_at() is None
+
+
+def test_transient_failure_keeps_snapshot_and_retries(acc):
+    valid = [acc]
+    bot._revalidated.append((acc, {'x': None, 'y': None}, set(), None))
+    bot.apply_revalidated(valid)
+    assert valid == [acc] and [a.name for a in acc['_agents']] == ['old-x', 'old-y']
+    assert bot._revalidate_retry == [acc] and bot.next_revalidate_at() > bot.now()
+
+
+def test_account_dropped_only_when_every_agent_is_404(acc):
+    valid = [acc]
+    bot._revalidated.append((acc, {'x': None, 'y': bot.Agent('y', 'new-y')}, {'x'}, bot.Stats()))
+    bot.apply_revalidated(valid)
+    assert valid == [acc] and [a.name for a in acc['_agents']] == ['new-y']
+    bot._revalidated.append((acc, {'x': None, 'y': None}, {'x', 'y'}, None))
+    bot.apply_revalidated(valid)
+    assert valid == []
+
+
+def test_all_404_with_battle_in_flight_is_retried_then_released(acc, monkeypatch):
+    valid = [acc]
+    monkeypatch.setattr(bot, '_inflight', {'B1': {'acc': acc}})
+    bot._revalidated.append((acc, {'x': None, 'y': None}, {'x', 'y'}, None))
+    bot.apply_revalidated(valid)
+    assert valid == [acc] and bot._revalidate_retry == [acc]
+    bot._inflight.clear()
+    bot._revalidated.append((acc, {'x': None, 'y': None}, {'x', 'y'}, None))
+    bot.apply_revalidated(valid)
+    assert valid == []